@@ -0,0 +1,94 @@
+"""
+week01/bench_balancer.py
+
+Latency benchmark for the Ollama balancer against local mock servers.
+
+Three mock endpoints with injected latency (one of them has a heavy tail)
+plus one dead URL. We compare tail latency with and without hedging, and
+check that the circuit breaker keeps the dead endpoint out of rotation.
+
+Run from the repo root:
+
+    python week01/bench_balancer.py
+"""
+
+import random
+import socket
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_ollama import MockOllamaServer
+from ollama_balancer import OllamaBalancer, OllamaError
+
+
+N_REQUESTS = 300
+CONCURRENCY = 8
+
+
+def make_latency(base: float, tail_prob: float, tail: float, seed: int):
+    rng = random.Random(seed)
+
+    def latency(path: str) -> float:
+        return tail if rng.random() < tail_prob else base * rng.uniform(0.8, 1.2)
+
+    return latency
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(balancer: OllamaBalancer, label: str) -> None:
+    def one(i: int):
+        started = time.perf_counter()
+        try:
+            balancer.generate(f"question {i}")
+            return time.perf_counter() - started, None
+        except OllamaError as e:
+            return time.perf_counter() - started, e
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        results = list(pool.map(one, range(N_REQUESTS)))
+
+    latencies = [t * 1000 for t, err in results if err is None]
+    errors = sum(1 for _, err in results if err is not None)
+    stats = balancer.stats()
+    print(f"--- {label} ---")
+    print(
+        f"p50={statistics.median(latencies):.0f}ms  "
+        f"p95={percentile(latencies, 0.95):.0f}ms  "
+        f"p99={percentile(latencies, 0.99):.0f}ms  "
+        f"errors={errors}  hedges sent/won={stats['hedges_sent']}/{stats['hedges_won']}"
+    )
+    for ep in stats["endpoints"]:
+        print(f"    {ep['url']}: requests={ep['requests']} failures={ep['failures']} breaker={ep['breaker']}")
+    print()
+
+
+if __name__ == "__main__":
+    servers = [
+        MockOllamaServer(latency=make_latency(0.02, 0.02, 0.3, seed=1)),
+        MockOllamaServer(latency=make_latency(0.02, 0.02, 0.3, seed=2)),
+        # The "slow instance": same median, much heavier tail
+        MockOllamaServer(latency=make_latency(0.02, 0.15, 0.8, seed=3)),
+    ]
+    for server in servers:
+        server.start()
+    dead_url = f"http://127.0.0.1:{free_port()}"
+    urls = [server.url for server in servers] + [dead_url]
+
+    try:
+        options = dict(timeout=5.0, backoff_base=0.01, reset_timeout=30.0)
+        run(OllamaBalancer(urls, hedge=False, **options), "least-outstanding, no hedging")
+        run(OllamaBalancer(urls, hedge=True, **options), "least-outstanding + hedging")
+    finally:
+        for server in servers:
+            server.stop()
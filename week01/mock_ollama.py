@@ -0,0 +1,224 @@
+"""
+week01/mock_ollama.py
+
+A tiny local stand-in for the Ollama HTTP API, for demos and benchmarks
+that should run without a real model.
+
+Supports:
+- POST /api/generate   -> {"response": ..., "prompt_eval_count", "eval_count", "done": true}
+- POST /api/embeddings -> {"embedding": [...]}
+- Failure injection for tests: an HTTP error status, or a raw (e.g. non-JSON) body.
+
+Usage:
+
+    with MockOllamaServer(responder=lambda payload: "Hi!") as server:
+        os.environ["OLLAMA_BASE_URL"] = server.url
+        ...
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Union
+
+sys.path.insert(0, os.path.dirname(__file__))
+from token_utils import count_tokens
+
+
+EMBEDDING_DIM = 256
+
+# Light normalisation so simple paraphrases land on the same tokens.
+_CONTRACTIONS = {
+    "what's": "what is",
+    "whats": "what is",
+    "who's": "who is",
+    "how's": "how is",
+    "it's": "it is",
+    "can't": "can not",
+    "don't": "do not",
+}
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def bag_of_words_embedding(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """
+    Deterministic hashed bag-of-words embedding (unit length).
+    Good enough for a mock: paraphrases that share words score close to 1.0.
+    """
+    text = text.lower()
+    for short, long in _CONTRACTIONS.items():
+        text = text.replace(short, long)
+
+    vec = [0.0] * dim
+    for word in _WORD_RE.findall(text):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vec[index] += sign
+
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def _echo_responder(payload: Dict) -> str:
+    return f"(mock) You said: {payload.get('prompt', '')[-80:]}"
+
+
+class MockOllamaServer:
+    """
+    Threaded HTTP server that mimics the parts of the Ollama API we use.
+
+    - responder(payload) -> str builds the /api/generate "response".
+    - embedder(text) -> list of floats builds the /api/embeddings vector.
+    - latency is a fixed delay in seconds, or a callable(path) -> seconds.
+    - status is the HTTP status to answer with, or a callable(path) -> status;
+      anything other than 200 returns {"error": ...}.
+    - raw_body, if set, is sent as-is (status 200) instead of a JSON reply.
+
+    Request and token counters are kept so benchmarks can read them back.
+    """
+
+    def __init__(
+        self,
+        responder: Optional[Callable[[Dict], str]] = None,
+        embedder: Optional[Callable[[str], List[float]]] = None,
+        latency: Union[float, Callable[[str], float]] = 0.0,
+        status: Union[int, Callable[[str], int]] = 200,
+        raw_body: Optional[bytes] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.responder = responder or _echo_responder
+        self.embedder = embedder or bag_of_words_embedding
+        self.latency = latency
+        self.status = status
+        self.raw_body = raw_body
+        self.host = host
+        self.port = port
+
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.eval_tokens = 0
+
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def reset_counters(self) -> None:
+        with self.lock:
+            self.requests = 0
+            self.prompt_tokens = 0
+            self.eval_tokens = 0
+
+    def _delay(self, path: str) -> None:
+        seconds = self.latency(path) if callable(self.latency) else self.latency
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):  # keep demo output quiet
+                return
+
+            def _send_json(self, status: int, body: Dict) -> None:
+                self._send_raw(status, json.dumps(body).encode("utf-8"))
+
+            def _send_raw(self, status: int, data: bytes) -> None:
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up (timeout or cancelled hedge)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": "invalid JSON"})
+                    return
+
+                server._delay(self.path)
+
+                status = server.status(self.path) if callable(server.status) else server.status
+                if status != 200 or server.raw_body is not None:
+                    with server.lock:
+                        server.requests += 1
+                    if status != 200:
+                        self._send_json(status, {"error": f"mock status {status}"})
+                    else:
+                        self._send_raw(200, server.raw_body)
+                    return
+
+                if self.path == "/api/generate":
+                    text = server.responder(payload)
+                    prompt_tokens = count_tokens(payload.get("prompt", ""))
+                    eval_tokens = count_tokens(text)
+                    with server.lock:
+                        server.requests += 1
+                        server.prompt_tokens += prompt_tokens
+                        server.eval_tokens += eval_tokens
+                    self._send_json(
+                        200,
+                        {
+                            "model": payload.get("model", "mock"),
+                            "response": text,
+                            "done": True,
+                            "prompt_eval_count": prompt_tokens,
+                            "eval_count": eval_tokens,
+                        },
+                    )
+                elif self.path == "/api/embeddings":
+                    with server.lock:
+                        server.requests += 1
+                    embedding = server.embedder(payload.get("prompt", ""))
+                    self._send_json(200, {"embedding": embedding})
+                else:
+                    self._send_json(404, {"error": f"unknown path {self.path}"})
+
+        return Handler
+
+    def start(self) -> "MockOllamaServer":
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "MockOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    with MockOllamaServer(port=11434) as mock:
+        print(f"Mock Ollama listening on {mock.url} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("Bye!")
@@ -0,0 +1,535 @@
+"""
+week01/ollama_balancer.py
+
+Client-side load balancer for one or more Ollama endpoints.
+
+- Picks the endpoint with the fewest outstanding requests.
+- Raises typed exceptions (OllamaError and subclasses) instead of
+  returning "Error: ..." strings that look like real answers.
+- Retries failed requests with jittered exponential backoff.
+- Keeps a circuit breaker per endpoint, so a dead instance is skipped
+  until its cool-down has passed.
+- Hedging: if a request is still running after the recent p95 latency,
+  a duplicate goes to a second endpoint and the first reply wins; the
+  losing duplicate is aborted. This trims the p99 caused by a single slow
+  instance. No hedging happens until enough latencies have been seen.
+
+Endpoints come from the OLLAMA_ENDPOINTS env var (comma-separated),
+falling back to OLLAMA_BASE_URL, then http://localhost:11434.
+Other settings for the shared balancer (unset = default):
+- OLLAMA_TIMEOUT               seconds per request (default: no timeout)
+- OLLAMA_MAX_RETRIES           retries after the first attempt (default 2)
+- OLLAMA_HEDGE                 "0" disables hedging
+- OLLAMA_HEDGE_INITIAL_DELAY   hedge delay before enough samples exist
+                               (default: don't hedge yet)
+"""
+
+import http.client
+import json
+import os
+import random
+import socket
+import threading
+import time
+import urllib.parse
+import weakref
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+
+# --- 1. Exceptions --------------------------------------------------------------
+
+
+class OllamaError(Exception):
+    """Base class for every failure talking to Ollama."""
+
+
+class OllamaConnectionError(OllamaError):
+    """Endpoint unreachable, connection dropped, or a 5xx reply."""
+
+
+class OllamaTimeoutError(OllamaError):
+    """The endpoint did not answer within the timeout."""
+
+
+class OllamaResponseError(OllamaError):
+    """
+    The endpoint answered, but the request or the reply was bad
+    (4xx status, invalid JSON, missing fields). Not retried.
+    """
+
+
+class NoHealthyEndpointError(OllamaError):
+    """Every endpoint's circuit breaker is open."""
+
+
+# --- 2. Circuit breaker / endpoint state -----------------------------------------
+
+
+class CircuitBreaker:
+    """
+    closed    -> requests flow; `failure_threshold` failures in a row opens it.
+    open      -> requests are refused until `reset_timeout` seconds pass.
+    half_open -> one trial request; success closes it, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def available(self, now: float) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return now - self.opened_at >= self.reset_timeout
+        return not self.trial_in_flight
+
+    def on_dispatch(self, now: float) -> None:
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            self.trial_in_flight = True
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trial_in_flight = False
+
+    def record_cancelled(self) -> None:
+        """A request we aborted ourselves says nothing about the endpoint."""
+        self.trial_in_flight = False
+
+    def record_failure(self, now: float) -> None:
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = now
+
+
+class Endpoint:
+    def __init__(self, url: str, breaker: CircuitBreaker):
+        self.url = url.rstrip("/")
+        self.breaker = breaker
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"Endpoint({self.url!r}, outstanding={self.outstanding}, "
+            f"breaker={self.breaker.state})"
+        )
+
+
+class _InFlight:
+    """
+    Handle on one in-flight HTTP request, so a hedged request can abort its
+    losing duplicate: shutting the socket down wakes the blocked read, and
+    Ollama stops generating once the client is gone.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cancelled = False
+        self.conn: Optional[http.client.HTTPConnection] = None
+
+    def attach(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self.conn = conn
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            conn = self.conn
+        sock = conn.sock if conn is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+# --- 3. The balancer --------------------------------------------------------------
+
+# Every balancer, so a forked child can reset their thread pools and locks
+# (the child inherits the pool object but not its worker threads).
+_BALANCERS: "weakref.WeakSet[OllamaBalancer]" = weakref.WeakSet()
+
+
+class OllamaBalancer:
+    def __init__(
+        self,
+        endpoints: Iterable[str],
+        timeout: Optional[float] = None,
+        max_retries: int = 2,
+        backoff_base: float = 0.25,
+        backoff_cap: float = 4.0,
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        hedge_initial_delay: Optional[float] = None,
+        hedge_min_delay: float = 0.05,
+        hedge_min_samples: int = 20,
+        failure_threshold: int = 3,
+        reset_timeout: float = 10.0,
+        max_workers: int = 32,
+    ):
+        urls = [u.strip() for u in endpoints if u and u.strip()]
+        if not urls:
+            raise ValueError("OllamaBalancer needs at least one endpoint URL")
+
+        self.endpoints: List[Endpoint] = [
+            Endpoint(url, CircuitBreaker(failure_threshold, reset_timeout)) for url in urls
+        ]
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_initial_delay = hedge_initial_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+        self._lock = threading.Lock()
+        # Recent successful latencies per API path (generate and embeddings differ a lot)
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None  # created on first use
+        _BALANCERS.add(self)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self._max_workers, thread_name_prefix="ollama"
+                )
+            return self._pool
+
+    def _reset_after_fork(self) -> None:
+        """In a forked child: fresh lock and pool, no requests in flight."""
+        self._lock = threading.Lock()
+        self._pool = None
+        for ep in self.endpoints:
+            ep.outstanding = 0
+            ep.breaker.trial_in_flight = False
+
+    # --- endpoint selection -----------------------------------------------------
+
+    def _pick(self, exclude: Set[Endpoint] = frozenset()) -> Endpoint:
+        """Least outstanding requests among endpoints whose breaker allows it."""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                ep for ep in self.endpoints if ep not in exclude and ep.breaker.available(now)
+            ]
+            if not candidates:
+                raise NoHealthyEndpointError(
+                    "No healthy Ollama endpoint (all circuit breakers open): "
+                    + ", ".join(ep.url for ep in self.endpoints)
+                )
+            fewest = min(ep.outstanding for ep in candidates)
+            endpoint = random.choice([ep for ep in candidates if ep.outstanding == fewest])
+            endpoint.breaker.on_dispatch(now)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def hedge_delay(self, path: str) -> Optional[float]:
+        """
+        Seconds to wait before sending a hedged duplicate (recent p95 latency).
+        None = don't hedge (too few samples and no hedge_initial_delay).
+        """
+        with self._lock:
+            samples = sorted(self._latencies.get(path, ()))
+        if len(samples) < self.hedge_min_samples:
+            return self.hedge_initial_delay
+        index = min(len(samples) - 1, int(self.hedge_quantile * len(samples)))
+        return max(self.hedge_min_delay, samples[index])
+
+    # --- one HTTP call ------------------------------------------------------------
+
+    def _send(
+        self, endpoint: Endpoint, path: str, payload: Dict, handle: Optional[_InFlight] = None
+    ) -> Dict:
+        """POST to one endpoint. The caller has already counted it in `outstanding`."""
+        url = urllib.parse.urlsplit(endpoint.url)
+        conn_class = (
+            http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        )
+        conn = conn_class(url.hostname, url.port, timeout=self.timeout)
+        if handle is not None:
+            handle.attach(conn)
+
+        data = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+
+        started = time.monotonic()
+        endpoint_failed = True  # False once the endpoint has answered at all
+        ok = False
+        try:
+            conn.connect()
+            if handle is not None and handle.cancelled:
+                raise OllamaConnectionError(f"{endpoint.url}: request cancelled")
+            conn.request("POST", url.path.rstrip("/") + path, body=data, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+
+            if response.status >= 500:
+                raise OllamaConnectionError(
+                    f"{endpoint.url}: HTTP {response.status} {response.reason}"
+                )
+            # From here on the endpoint is healthy, even if the reply is unusable.
+            endpoint_failed = False
+            if response.status >= 400:
+                raise OllamaResponseError(
+                    f"{endpoint.url}: HTTP {response.status} {response.reason}"
+                )
+            try:
+                result = json.loads(body.decode("utf-8"))
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                raise OllamaResponseError(f"{endpoint.url}: invalid JSON reply ({e})") from e
+            ok = True
+            return result
+        except OllamaError:
+            raise
+        except TimeoutError as e:
+            raise OllamaTimeoutError(f"{endpoint.url}: timed out after {self.timeout}s") from e
+        except (OSError, http.client.HTTPException) as e:
+            raise OllamaConnectionError(
+                f"{endpoint.url}: could not connect. Is Ollama running? ({e})"
+            ) from e
+        finally:
+            conn.close()
+            elapsed = time.monotonic() - started
+            with self._lock:
+                endpoint.outstanding -= 1
+                if ok:
+                    endpoint.breaker.record_success()
+                    self._latencies.setdefault(path, deque(maxlen=200)).append(elapsed)
+                elif handle is not None and handle.cancelled:
+                    endpoint.breaker.record_cancelled()
+                elif endpoint_failed:
+                    endpoint.failures += 1
+                    endpoint.breaker.record_failure(time.monotonic())
+                else:
+                    endpoint.breaker.record_success()
+
+    def _abandon(self, endpoint: Endpoint) -> None:
+        """Undo _pick() for a request that was cancelled before it started."""
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.breaker.record_cancelled()
+
+    # --- hedging / retries ----------------------------------------------------------
+
+    def _hedged_request(self, path: str, payload: Dict) -> Dict:
+        pool = self._get_pool()
+        launched: Dict[Future, tuple] = {}  # future -> (endpoint, in-flight handle)
+
+        def launch(endpoint: Endpoint) -> None:
+            handle = _InFlight()
+            launched[pool.submit(self._send, endpoint, path, payload, handle)] = (endpoint, handle)
+
+        primary = self._pick()
+        launch(primary)
+
+        delay = self.hedge_delay(path) if self.hedge and len(self.endpoints) > 1 else None
+        if delay is not None:
+            done, _ = wait(list(launched), timeout=delay)
+            if not done:
+                try:
+                    backup = self._pick(exclude={primary})
+                except NoHealthyEndpointError:
+                    backup = None
+                if backup is not None:
+                    with self._lock:
+                        self.hedges_sent += 1
+                    launch(backup)
+
+        # First success wins; the other request is aborted.
+        errors: List[OllamaError] = []
+        pending = set(launched)
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        result = future.result()
+                    except OllamaError as e:
+                        errors.append(e)
+                        continue
+                    if launched[future][0] is not primary:
+                        with self._lock:
+                            self.hedges_won += 1
+                    return result
+        finally:
+            for future in pending:
+                endpoint, handle = launched[future]
+                handle.cancel()
+                if future.cancel():
+                    self._abandon(endpoint)
+
+        # Prefer reporting a bad-request error: retrying it elsewhere won't help.
+        for error in errors:
+            if isinstance(error, OllamaResponseError):
+                raise error
+        raise errors[-1]
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def request(self, path: str, payload: Dict) -> Dict:
+        """
+        POST a JSON payload to `path` on the best endpoint and return the JSON reply.
+        Raises an OllamaError subclass once retries are exhausted.
+        """
+        last_error: Optional[OllamaError] = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self._backoff(attempt - 1))
+            try:
+                slots = _REQUEST_SLOTS
+                if slots is None:
+                    return self._hedged_request(path, payload)
+                # A hedged pair counts as one slot: it is one logical request.
+                with slots:
+                    return self._hedged_request(path, payload)
+            except OllamaResponseError:
+                raise
+            except OllamaError as e:
+                last_error = e
+        raise last_error
+
+    # --- Ollama API helpers -----------------------------------------------------------
+
+    def generate(self, prompt: str, model: str = "llama3", format: Optional[Any] = None) -> str:
+        """
+        format: optional Ollama structured-output setting ("json" or a JSON schema dict).
+        """
+        data = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,  # get full response
+        }
+        if format is not None:
+            data["format"] = format
+        res_data = self.request("/api/generate", data)
+        if "response" not in res_data:
+            raise OllamaResponseError(f"Ollama reply has no 'response' field: {res_data}")
+        return res_data["response"]
+
+    def embed(self, text: str, model: str = "nomic-embed-text") -> List[float]:
+        res_data = self.request("/api/embeddings", {"model": model, "prompt": text})
+        embedding = res_data.get("embedding")
+        if not embedding:
+            raise OllamaResponseError(f"Ollama returned no embedding for model {model!r}")
+        return embedding
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "endpoints": [
+                    {
+                        "url": ep.url,
+                        "outstanding": ep.outstanding,
+                        "requests": ep.requests,
+                        "failures": ep.failures,
+                        "breaker": ep.breaker.state,
+                    }
+                    for ep in self.endpoints
+                ],
+                "hedges_sent": self.hedges_sent,
+                "hedges_won": self.hedges_won,
+            }
+
+
+# --- 4. Shared instance ---------------------------------------------------------------
+
+# Optional cap on concurrent Ollama requests (generate and embeddings) in this
+# process. Any object with acquire()/release() works, e.g. a threading or a
+# multiprocessing semaphore shared by batch workers. None = unbounded.
+_REQUEST_SLOTS = None
+
+
+def set_request_slots(slots):
+    """Install (or clear, with None) the request cap. Returns the previous one."""
+    global _REQUEST_SLOTS
+    previous = _REQUEST_SLOTS
+    _REQUEST_SLOTS = slots
+    return previous
+
+
+_DEFAULT_BALANCER: Optional[OllamaBalancer] = None
+_DEFAULT_BALANCER_LOCK = threading.Lock()
+
+
+def default_endpoints() -> List[str]:
+    endpoints = os.environ.get("OLLAMA_ENDPOINTS", "")
+    if endpoints.strip():
+        return [u.strip() for u in endpoints.split(",") if u.strip()]
+    return [os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")]
+
+
+def default_options() -> Dict[str, Any]:
+    """Balancer settings from the OLLAMA_* env vars (see the module docstring)."""
+    options: Dict[str, Any] = {}
+    timeout = os.environ.get("OLLAMA_TIMEOUT", "").strip()
+    if timeout:
+        options["timeout"] = float(timeout) if float(timeout) > 0 else None
+    retries = os.environ.get("OLLAMA_MAX_RETRIES", "").strip()
+    if retries:
+        options["max_retries"] = int(retries)
+    hedge = os.environ.get("OLLAMA_HEDGE", "").strip().lower()
+    if hedge:
+        options["hedge"] = hedge not in ("0", "false", "no", "off")
+    initial_delay = os.environ.get("OLLAMA_HEDGE_INITIAL_DELAY", "").strip()
+    if initial_delay:
+        options["hedge_initial_delay"] = float(initial_delay)
+    return options
+
+
+def get_default_balancer() -> OllamaBalancer:
+    """The process-wide balancer used by call_ollama_llm and get_ollama_embedding."""
+    global _DEFAULT_BALANCER
+    with _DEFAULT_BALANCER_LOCK:
+        if _DEFAULT_BALANCER is None:
+            _DEFAULT_BALANCER = OllamaBalancer(default_endpoints(), **default_options())
+        return _DEFAULT_BALANCER
+
+
+def set_default_balancer(balancer: Optional[OllamaBalancer]) -> None:
+    """Replace the shared balancer (None = rebuild from the env vars on next use)."""
+    global _DEFAULT_BALANCER
+    with _DEFAULT_BALANCER_LOCK:
+        _DEFAULT_BALANCER = balancer
+
+
+def configure_endpoints(endpoints: Iterable[str], **options) -> OllamaBalancer:
+    """Convenience: build a balancer for these URLs and make it the default."""
+    balancer = OllamaBalancer(endpoints, **options)
+    set_default_balancer(balancer)
+    return balancer
+
+
+def _reset_after_fork_in_child() -> None:
+    global _DEFAULT_BALANCER_LOCK
+    _DEFAULT_BALANCER_LOCK = threading.Lock()
+    for balancer in list(_BALANCERS):
+        balancer._reset_after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork_in_child)
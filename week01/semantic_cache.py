@@ -0,0 +1,480 @@
+"""
+week01/semantic_cache.py
+
+Semantic answer cache.
+
+Exact-match caching misses paraphrases ("what's an AI agent" vs
+"what is an ai agent?"). Here we embed each query through Ollama's
+/api/embeddings and look for a previous query whose embedding is close enough.
+
+- Embeddings live in one float32 matrix (memory-mapped when a path is given).
+- Search is a single vectorised cosine-similarity pass (rows are unit length,
+  so cosine = dot product).
+- Optional IVF-style partitioning: once the cache is large, rows are grouped
+  under k-means centroids and only the closest few groups are scanned.
+- Entries have a TTL; when the cache is full, expired entries are reused
+  first, then the least recently used one is evicted.
+- hits / misses / evictions are counted for a hit-rate readout.
+- One process owns a cache file at a time (an exclusive lock on
+  "<path>.lock"). Another process opening the same path gets a private
+  in-memory cache instead, so two processes never overwrite each other's
+  rows while each keeps its own answer list.
+"""
+
+import atexit
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, IO, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+sys.path.insert(0, os.path.dirname(__file__))
+from simple_llm import get_ollama_embedding
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        embed_fn: Callable[[str], Sequence[float]] = get_ollama_embedding,
+        threshold: float = 0.9,
+        capacity: int = 10_000,
+        default_ttl: float = 24 * 3600,
+        path: Optional[str] = None,
+        n_lists: int = 0,
+        n_probe: int = 2,
+        enabled: bool = True,
+    ):
+        """
+        embed_fn:    text -> embedding vector (Ollama by default; swap in a mock).
+        threshold:   minimum cosine similarity that counts as a hit.
+        capacity:    max number of cached answers.
+        default_ttl: seconds an entry stays valid unless put() says otherwise.
+        path:        if set, embeddings are memory-mapped to this file and
+                     metadata is saved next to it by flush(). If another
+                     process already owns the file, this cache stays in
+                     memory (see `persistent`).
+        n_lists:     IVF partitions (0 = always scan everything).
+        n_probe:     IVF partitions scanned per lookup.
+        enabled:     False turns lookup() into an always-miss and put() into
+                     a no-op (e.g. for evaluation runs).
+        """
+        self.embed_fn = embed_fn
+        self.enabled = enabled
+        self.threshold = threshold
+        self.capacity = capacity
+        self.default_ttl = default_ttl
+        self.n_lists = n_lists
+
+        # Own the file or don't touch it at all
+        self._lock_file = _try_lock(f"{path}.lock") if path and enabled else None
+        self.path = path if self._lock_file is not None else None
+        self.persistent = self.path is not None
+        self.n_probe = n_probe
+
+        self._lock = threading.RLock()
+
+        # Row storage. _vectors is allocated once the embedding size is known.
+        self._dim: Optional[int] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._size = 0  # rows ever used (high-water mark)
+        self._free: List[int] = []  # rows freed by expiry, reused first
+
+        self._queries: List[Optional[str]] = [None] * capacity
+        self._answers: List[Optional[str]] = [None] * capacity
+        self._live = np.zeros(capacity, dtype=bool)
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._namespace_ids = np.zeros(capacity, dtype=np.int32)
+        self._namespaces: Dict[str, int] = {}
+
+        # IVF index
+        self._centroids: Optional[np.ndarray] = None
+        self._list_ids = np.full(capacity, -1, dtype=np.int32)
+        self._trained_size = 0
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.embed_errors = 0
+
+        # (text, unit vector) of the last embedding, so a lookup miss followed
+        # by put() for the same query costs one /api/embeddings call, not two.
+        self._last_embedding: Optional[tuple] = None
+
+        if path and os.path.exists(self._meta_path()):
+            self._load()
+
+    # --- storage helpers ------------------------------------------------------
+
+    def _meta_path(self) -> str:
+        return f"{self.path}.meta.json"
+
+    def _allocate(self, dim: int, mode: str = "w+") -> None:
+        self._dim = dim
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._vectors = np.memmap(
+                self.path, dtype=np.float32, mode=mode, shape=(self.capacity, dim)
+            )
+        else:
+            self._vectors = np.zeros((self.capacity, dim), dtype=np.float32)
+
+    def _namespace_id(self, namespace: str) -> int:
+        if namespace not in self._namespaces:
+            self._namespaces[namespace] = len(self._namespaces)
+        return self._namespaces[namespace]
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        last = self._last_embedding
+        if last is not None and last[0] == text:
+            return last[1]
+
+        # The cache must never break the caller: on any embedding
+        # failure we just behave like a miss.
+        try:
+            vec = np.asarray(self.embed_fn(text), dtype=np.float32)
+        except Exception:
+            self.embed_errors += 1
+            return None
+        norm = float(np.linalg.norm(vec))
+        if vec.ndim != 1 or norm == 0.0:
+            self.embed_errors += 1
+            return None
+        if self._dim is not None and vec.shape[0] != self._dim:
+            self.embed_errors += 1
+            return None
+        vec = vec / norm
+        self._last_embedding = (text, vec)
+        return vec
+
+    # --- search -----------------------------------------------------------------
+
+    def _candidate_rows(self, vec: np.ndarray):
+        """
+        Rows to scan: a slice over everything (no copy of the matrix),
+        or, with an IVF index, the rows in the closest n_probe partitions.
+        """
+        if self._centroids is None:
+            return slice(0, self._size)
+        probes = np.argsort(-(self._centroids @ vec))[: self.n_probe]
+        return np.flatnonzero(np.isin(self._list_ids[: self._size], probes))
+
+    def _best_match(self, vec: np.ndarray, namespace_id: int, now: float):
+        """
+        Return (row, similarity) of the closest live entry, or (None, -1.0).
+        Expired rows seen on the way are released.
+        """
+        rows = self._candidate_rows(vec)
+        row_ids = np.arange(self._size) if isinstance(rows, slice) else rows
+        if row_ids.size == 0:
+            return None, -1.0
+
+        live = self._live[rows]
+        expired = row_ids[live & (self._expires[rows] <= now)]
+        for row in expired:
+            self._release(int(row))
+        self.expirations += len(expired)
+
+        valid = self._live[rows] & (self._namespace_ids[rows] == namespace_id)
+        if not valid.any():
+            return None, -1.0
+
+        sims = self._vectors[rows] @ vec
+        sims[~valid] = -np.inf
+        best = int(np.argmax(sims))
+        return int(row_ids[best]), float(sims[best])
+
+    # --- public API ---------------------------------------------------------------
+
+    def lookup(self, query: str, namespace: str = "") -> Optional[str]:
+        """
+        Return the cached answer for a query similar to `query`, or None.
+        """
+        if not self.enabled:
+            return None
+        vec = self._embed(query) if self._size else None
+        with self._lock:
+            if vec is None or namespace not in self._namespaces:
+                self.misses += 1
+                return None
+
+            now = time.time()
+            row, sim = self._best_match(vec, self._namespaces[namespace], now)
+            if row is None or sim < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._last_used[row] = now
+            return self._answers[row]
+
+    def put(
+        self, query: str, answer: str, namespace: str = "", ttl: Optional[float] = None
+    ) -> None:
+        """
+        Store an answer. A near-identical query in the same namespace is overwritten.
+        """
+        if not self.enabled:
+            return
+        vec = self._embed(query)
+        if vec is None:
+            return
+
+        with self._lock:
+            if self._vectors is None:
+                self._allocate(vec.shape[0])
+
+            now = time.time()
+            namespace_id = self._namespace_id(namespace)
+            row, sim = self._best_match(vec, namespace_id, now)
+            if row is None or sim < 0.999:
+                row = self._take_row(now)
+
+            self._vectors[row] = vec
+            self._queries[row] = query
+            self._answers[row] = answer
+            self._live[row] = True
+            self._expires[row] = now + (self.default_ttl if ttl is None else ttl)
+            self._last_used[row] = now
+            self._namespace_ids[row] = namespace_id
+            if self._centroids is not None:
+                self._list_ids[row] = int(np.argmax(self._centroids @ vec))
+
+            self._maybe_train()
+
+    def _take_row(self, now: float) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._size < self.capacity:
+            self._size += 1
+            return self._size - 1
+
+        # Full: reuse an expired row if there is one, else evict the LRU row.
+        live = self._live[: self._size]
+        expired = np.flatnonzero(live & (self._expires[: self._size] <= now))
+        if expired.size:
+            self.expirations += expired.size
+            for row in expired[1:]:
+                self._release(int(row))
+            return int(expired[0])
+
+        last_used = np.where(live, self._last_used[: self._size], np.inf)
+        self.evictions += 1
+        return int(np.argmin(last_used))
+
+    def _release(self, row: int) -> None:
+        self._live[row] = False
+        self._queries[row] = None
+        self._answers[row] = None
+        self._list_ids[row] = -1
+        self._free.append(row)
+
+    def invalidate(self, namespace: Optional[str] = None) -> None:
+        """Drop every entry (or every entry of one namespace)."""
+        with self._lock:
+            live_rows = np.flatnonzero(self._live[: self._size])
+            if namespace is not None:
+                if namespace not in self._namespaces:
+                    return
+                ns_id = self._namespaces[namespace]
+                live_rows = live_rows[self._namespace_ids[live_rows] == ns_id]
+            for row in live_rows:
+                self._release(int(row))
+
+    # --- IVF partitioning -------------------------------------------------------
+
+    def _maybe_train(self) -> None:
+        """
+        (Re)build the IVF partitions once the cache is large enough,
+        and again every time it doubles.
+        """
+        if self.n_lists <= 0:
+            return
+        live_count = int(self._live[: self._size].sum())
+        if live_count < self.n_lists * 16 or live_count < 2 * self._trained_size:
+            return
+        self.rebuild_index()
+
+    def rebuild_index(self, iterations: int = 10) -> None:
+        """Spherical k-means over the live rows; each row joins its closest centroid."""
+        with self._lock:
+            rows = np.flatnonzero(self._live[: self._size])
+            if self.n_lists <= 0 or rows.size < self.n_lists:
+                return
+            data = np.asarray(self._vectors[rows])
+
+            rng = np.random.default_rng(0)
+            centroids = data[rng.choice(rows.size, self.n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                assign = np.argmax(data @ centroids.T, axis=1)
+                for k in range(self.n_lists):
+                    members = data[assign == k]
+                    if len(members):
+                        centroid = members.sum(axis=0)
+                        centroids[k] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+            self._centroids = centroids
+            self._list_ids[rows] = np.argmax(data @ centroids.T, axis=1)
+            self._trained_size = rows.size
+
+    # --- metrics / persistence ----------------------------------------------------
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": int(self._live[: self._size].sum()),
+                "capacity": self.capacity,
+                "lookups": self.hits + self.misses,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hit_rate, 4),
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "embed_errors": self.embed_errors,
+                "ivf_lists": 0 if self._centroids is None else len(self._centroids),
+                "persistent": self.persistent,
+            }
+
+    def flush(self) -> None:
+        """Write the memory-mapped matrix and the metadata sidecar to disk."""
+        if not self.path or self._vectors is None:
+            return
+        with self._lock:
+            self._vectors.flush()
+            meta = {
+                "dim": self._dim,
+                "capacity": self.capacity,
+                "size": self._size,
+                "queries": self._queries[: self._size],
+                "answers": self._answers[: self._size],
+                "live": self._live[: self._size].tolist(),
+                "expires": self._expires[: self._size].tolist(),
+                "last_used": self._last_used[: self._size].tolist(),
+                "namespace_ids": self._namespace_ids[: self._size].tolist(),
+                "namespaces": self._namespaces,
+            }
+            with open(self._meta_path(), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+
+    def close(self) -> None:
+        """
+        Flush and give up the file (and its lock) so another process can own
+        it. The cache keeps working in memory.
+        """
+        with self._lock:
+            self.flush()
+            if self._lock_file is None:
+                return
+            if self._vectors is not None:
+                self._vectors = np.array(self._vectors)  # detach from the memmap
+            self._lock_file.close()
+            self._lock_file = None
+            self.path = None
+            self.persistent = False
+
+    def _load(self) -> None:
+        with open(self._meta_path(), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["capacity"] != self.capacity:
+            raise ValueError(
+                f"{self.path} was saved with capacity {meta['capacity']}, not {self.capacity}"
+            )
+
+        self._allocate(meta["dim"], mode="r+")
+        size = self._size = meta["size"]
+        self._queries[:size] = meta["queries"]
+        self._answers[:size] = meta["answers"]
+        self._live[:size] = meta["live"]
+        self._expires[:size] = meta["expires"]
+        self._last_used[:size] = meta["last_used"]
+        self._namespace_ids[:size] = meta["namespace_ids"]
+        self._namespaces = dict(meta["namespaces"])
+        self._free = [row for row in range(size) if not self._live[row]]
+        self.rebuild_index()
+
+
+def _try_lock(path: str) -> Optional[IO]:
+    """
+    Take an exclusive, non-blocking lock on path. Returns the open lock file
+    (keep it open to hold the lock), or None if another process holds it.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    lock_file = open(path, "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+# --- Shared instance -----------------------------------------------------------
+
+_DEFAULT_CACHE: Optional[SemanticCache] = None
+
+
+def get_semantic_cache() -> SemanticCache:
+    """
+    The process-wide cache used by llm_node and study_buddy_loop.
+
+    Set SEMANTIC_CACHE=0 to turn it off (every lookup misses, nothing is
+    stored). Set SEMANTIC_CACHE_PATH to keep it on disk between runs; it is flushed
+    at exit. Only a top-level process uses the file: pool workers (forked or
+    spawned) get their own in-memory cache, so they never truncate or write
+    the shared memory-mapped file. Of several top-level processes (say a
+    study-buddy session and a batch run), the first one owns the file and
+    the others run with an in-memory cache.
+    """
+    global _DEFAULT_CACHE
+    if _DEFAULT_CACHE is None:
+        enabled = os.environ.get("SEMANTIC_CACHE", "1").strip().lower() not in (
+            "0", "false", "no", "off"
+        )
+        path = os.environ.get("SEMANTIC_CACHE_PATH")
+        if multiprocessing.parent_process() is not None:
+            path = None
+        _DEFAULT_CACHE = SemanticCache(path=path, enabled=enabled)
+        if path:
+            atexit.register(_DEFAULT_CACHE.flush)
+    return _DEFAULT_CACHE
+
+
+def set_semantic_cache(cache: Optional[SemanticCache]) -> Optional[SemanticCache]:
+    """
+    Replace the shared cache (e.g. with one using a mock embedder, or a
+    disabled one). Returns the previous one.
+    """
+    global _DEFAULT_CACHE
+    previous = _DEFAULT_CACHE
+    _DEFAULT_CACHE = cache
+    return previous
+
+
+def _forget_cache_after_fork() -> None:
+    # A forked child must not keep using the parent's memory-mapped file.
+    global _DEFAULT_CACHE
+    _DEFAULT_CACHE = None
+
+
+os.register_at_fork(after_in_child=_forget_cache_after_fork)
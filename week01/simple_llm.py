@@ -1,33 +1,33 @@
-import json
-import urllib.request
-import urllib.error
+import os
+import sys
+from typing import Any, List, Optional
 
+sys.path.insert(0, os.path.dirname(__file__))
+from ollama_balancer import OllamaError, get_default_balancer, set_request_slots
 
-def call_ollama_llm(prompt: str, model: str = "llama3") -> str:
+
+# Endpoints are configured with the OLLAMA_ENDPOINTS env var
+# (comma-separated URLs) or OLLAMA_BASE_URL for a single one.
+# See ollama_balancer.py for retries, circuit breaking and hedging.
+
+
+def call_ollama_llm(prompt: str, model: str = "llama3", format: Optional[Any] = None) -> str:
     """
-    Calls the Ollama API directly via HTTP.
+    Calls the Ollama API over HTTP through the shared endpoint balancer.
+    Raises an OllamaError subclass on failure instead of returning an
+    error string, so callers can't mistake it for a real answer.
+
+    Pass format="json" or a JSON schema dict to get structured output.
     """
-    url = "http://localhost:11434/api/generate"
-    data = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False,  # get full response
-    }
-
-    jsondata = json.dumps(data).encode("utf-8")
-
-    # NOTE: use headers=..., not content_type=
-    headers = {"Content-Type": "application/json"}
-    req = urllib.request.Request(url, data=jsondata, headers=headers, method="POST")
-
-    try:
-        with urllib.request.urlopen(req) as response:
-            res_data = json.loads(response.read().decode("utf-8"))
-            return res_data.get("response", "")
-    except urllib.error.URLError as e:
-        return f"Error: Could not connect to Ollama. Is it running? ({e})"
-    except Exception as e:
-        return f"Error: {e}"
+    return get_default_balancer().generate(prompt, model=model, format=format)
+
+
+def get_ollama_embedding(text: str, model: str = "nomic-embed-text") -> List[float]:
+    """
+    Calls Ollama's /api/embeddings endpoint and returns the embedding vector.
+    Raises an OllamaError subclass on failure.
+    """
+    return get_default_balancer().embed(text, model=model)
 
 def chat_loop():
     system_prompt = (
@@ -50,7 +50,11 @@ def chat_loop():
         full_prompt = f"{system_prompt}\n\nUser: {user_input}\nAssistant:"
         
         print("\nThinking...")
-        response = call_ollama_llm(full_prompt)
+        try:
+            response = call_ollama_llm(full_prompt)
+        except OllamaError as e:
+            print(f"LLM error: {e}\n")
+            continue
         print(f"LLM: {response}\n")
 
 if __name__ == "__main__":
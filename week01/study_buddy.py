@@ -3,7 +3,8 @@ import os
 from datetime import datetime, UTC
 from typing import List, Dict
 
-from simple_llm import call_ollama_llm  # reuse your wrapper
+from simple_llm import OllamaError, call_ollama_llm  # reuse your wrapper
+from semantic_cache import get_semantic_cache
 
 
 HISTORY_FILE = "notes/study_buddy_history.json"
@@ -46,10 +47,12 @@ def summarize_session(history: List[Dict]) -> str:
 
 def study_buddy_loop(goal: str):
     print("=== Study Buddy (Ollama) ===")
-    print("Commands: /summary (summarize), /exit (quit)")
+    print("Commands: /summary (summarize), /cache (cache stats), /exit (quit)")
     print(f"Your current learning goal: {goal}\n")
 
     history = load_history()
+    session_start = len(history)  # turns before this belong to earlier sessions
+    cache = get_semantic_cache()
 
     while True:
         user_input = input("You: ").strip()
@@ -60,14 +63,22 @@ def study_buddy_loop(goal: str):
         if user_input.lower() in {"/exit", "exit", "quit"}:
             print("Goodbye! Your session history is saved.")
             save_history(history)
+            cache.flush()
             break
 
         if user_input.lower() in {"/summary", "summary"}:
             print("\n[Generating session summary...]\n")
-            summary = summarize_session(history)
+            try:
+                summary = summarize_session(history)
+            except OllamaError as e:
+                summary = f"Could not generate a summary: {e}"
             print(summary + "\n")
             continue
 
+        if user_input.lower() in {"/cache", "cache"}:
+            print(f"\n[Semantic cache] {cache.stats()}\n")
+            continue
+
         # Short-term memory: last few turns
         recent_turns = history[-5:]
         context_text = ""
@@ -87,8 +98,24 @@ def study_buddy_loop(goal: str):
             f"Assistant:"
         )
 
-        print("\nThinking...")
-        assistant_reply = call_ollama_llm(full_prompt)
+        # Cache policy: the opening question of a session is looked up and
+        # stored per goal, so asking it again (or a paraphrase) in a later
+        # session reuses the answer. Its prompt does include the last turns
+        # of earlier sessions, but those are background; we accept that.
+        # Once this session has turns, questions tend to build on them
+        # ("can you give an example?"), so they always go to the model.
+        cacheable = len(history) == session_start
+        assistant_reply = cache.lookup(user_input, namespace=goal) if cacheable else None
+        if assistant_reply is None:
+            print("\nThinking...")
+            try:
+                assistant_reply = call_ollama_llm(full_prompt)
+            except OllamaError as e:
+                # Don't store errors in the history as if they were answers
+                print(f"Tutor unavailable: {e}\n")
+                continue
+            if cacheable:
+                cache.put(user_input, assistant_reply, namespace=goal)
         print(f"Tutor: {assistant_reply}\n")
 
         history.append(
@@ -0,0 +1,287 @@
+"""
+week01/test_ollama_balancer.py
+
+Tests for the Ollama balancer against MockOllamaServer (no real model needed).
+
+Run from the repo root:
+
+    python -m pytest -q week01/test_ollama_balancer.py
+"""
+
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import ollama_balancer
+from mock_ollama import MockOllamaServer
+from ollama_balancer import (
+    CircuitBreaker,
+    NoHealthyEndpointError,
+    OllamaBalancer,
+    OllamaConnectionError,
+    OllamaResponseError,
+    OllamaTimeoutError,
+    default_options,
+)
+
+
+def dead_url() -> str:
+    """A localhost URL nobody listens on (connection refused)."""
+    with MockOllamaServer() as server:
+        url = server.url
+    return url
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(OllamaBalancer, "_backoff", lambda self, attempt: 0.0)
+
+
+# --- circuit breaker -------------------------------------------------------------
+
+
+def test_breaker_closed_open_half_open_closed():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.available(0.0)
+
+    breaker.record_failure(1.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure(2.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.available(5.0)
+
+    # After reset_timeout, exactly one trial request is let through
+    assert breaker.available(12.0)
+    breaker.on_dispatch(12.0)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.available(12.0)
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.available(12.0)
+
+
+def test_breaker_half_open_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=1.0)
+    breaker.record_failure(0.0)
+    breaker.on_dispatch(2.0)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_failure(2.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.available(2.5)
+
+
+def test_breaker_opens_on_dead_endpoint_and_skips_it(no_backoff):
+    with MockOllamaServer(responder=lambda payload: "alive") as live:
+        balancer = OllamaBalancer(
+            [dead_url(), live.url], hedge=False, max_retries=1, failure_threshold=1
+        )
+        dead = balancer.endpoints[0]
+        answers = [balancer.generate("hi") for _ in range(10)]
+        # A retry goes to the live endpoint; the dead one fails once, then is skipped
+        assert answers == ["alive"] * 10
+        assert dead.failures <= 1
+        assert dead.breaker.state == CircuitBreaker.OPEN or dead.requests == 0
+
+
+def test_all_breakers_open_raises():
+    balancer = OllamaBalancer([dead_url()], hedge=False, max_retries=0, failure_threshold=1)
+    with pytest.raises(OllamaConnectionError):
+        balancer.generate("hi")
+    with pytest.raises(NoHealthyEndpointError):
+        balancer.generate("hi")
+
+
+# --- retries and backoff ---------------------------------------------------------
+
+
+def test_retry_recovers_from_server_errors(no_backoff):
+    calls = {"n": 0}
+
+    def flaky_status(path):
+        calls["n"] += 1
+        return 500 if calls["n"] <= 2 else 200
+
+    with MockOllamaServer(responder=lambda payload: "ok", status=flaky_status) as server:
+        balancer = OllamaBalancer([server.url], hedge=False, max_retries=2, failure_threshold=5)
+        assert balancer.generate("hi") == "ok"
+        assert server.requests == 3
+
+
+def test_retries_exhausted_raises_last_error(no_backoff):
+    with MockOllamaServer(status=503) as server:
+        balancer = OllamaBalancer([server.url], hedge=False, max_retries=2, failure_threshold=5)
+        with pytest.raises(OllamaConnectionError, match="503"):
+            balancer.generate("hi")
+        assert server.requests == 3
+
+
+def test_backoff_is_full_jitter_and_capped():
+    balancer = OllamaBalancer(["http://unused"], backoff_base=0.25, backoff_cap=1.0)
+    for attempt in range(6):
+        bound = min(1.0, 0.25 * 2 ** attempt)
+        delays = [balancer._backoff(attempt) for _ in range(50)]
+        assert all(0.0 <= d <= bound for d in delays)
+
+
+def test_retry_sleeps_between_attempts(monkeypatch):
+    slept = []
+    monkeypatch.setattr(ollama_balancer.time, "sleep", slept.append)
+    with MockOllamaServer(status=500) as server:
+        balancer = OllamaBalancer([server.url], hedge=False, max_retries=3, failure_threshold=10)
+        with pytest.raises(OllamaConnectionError):
+            balancer.generate("hi")
+    assert len(slept) == 3
+    assert all(0.0 <= d <= balancer.backoff_cap for d in slept)
+
+
+# --- error mapping -----------------------------------------------------------------
+
+
+def test_4xx_is_response_error_and_not_retried():
+    with MockOllamaServer(status=404) as server:
+        balancer = OllamaBalancer([server.url], hedge=False, max_retries=3, failure_threshold=1)
+        with pytest.raises(OllamaResponseError, match="404"):
+            balancer.generate("hi")
+        assert server.requests == 1
+        # The endpoint answered, so its breaker stays closed
+        assert balancer.endpoints[0].breaker.state == CircuitBreaker.CLOSED
+
+
+def test_5xx_is_connection_error_and_counts_as_failure(no_backoff):
+    with MockOllamaServer(status=500) as server:
+        balancer = OllamaBalancer([server.url], hedge=False, max_retries=0, failure_threshold=1)
+        with pytest.raises(OllamaConnectionError):
+            balancer.generate("hi")
+        assert balancer.endpoints[0].failures == 1
+        assert balancer.endpoints[0].breaker.state == CircuitBreaker.OPEN
+
+
+def test_timeout_is_timeout_error():
+    with MockOllamaServer(latency=0.5) as server:
+        balancer = OllamaBalancer([server.url], hedge=False, max_retries=0, timeout=0.1)
+        with pytest.raises(OllamaTimeoutError):
+            balancer.generate("hi")
+
+
+def test_connection_refused_is_connection_error():
+    balancer = OllamaBalancer([dead_url()], hedge=False, max_retries=0)
+    with pytest.raises(OllamaConnectionError, match="Is Ollama running"):
+        balancer.generate("hi")
+
+
+def test_invalid_json_is_response_error_not_endpoint_failure():
+    with MockOllamaServer(raw_body=b"<html>not json</html>") as server:
+        balancer = OllamaBalancer([server.url], hedge=False, max_retries=3, failure_threshold=1)
+        with pytest.raises(OllamaResponseError, match="invalid JSON"):
+            balancer.generate("hi")
+        endpoint = balancer.endpoints[0]
+        assert server.requests == 1
+        assert endpoint.failures == 0
+        assert endpoint.breaker.state == CircuitBreaker.CLOSED
+        assert endpoint.outstanding == 0
+
+
+# --- load balancing and hedging ------------------------------------------------------
+
+
+def test_least_outstanding_endpoint_is_picked():
+    balancer = OllamaBalancer(["http://a", "http://b", "http://c"])
+    a, b, c = balancer.endpoints
+    a.outstanding, b.outstanding, c.outstanding = 2, 0, 1
+    assert balancer._pick() is b
+    assert b.outstanding == 1 and b.requests == 1
+
+
+def test_no_hedge_before_enough_samples():
+    balancer = OllamaBalancer(["http://a", "http://b"], hedge_min_samples=3)
+    assert balancer.hedge_delay("/api/generate") is None
+    balancer._latencies["/api/generate"] = ollama_balancer.deque([0.2, 0.1, 0.3])
+    assert balancer.hedge_delay("/api/generate") == pytest.approx(0.3)
+
+
+def test_hedged_request_wins_and_loser_is_cancelled(monkeypatch):
+    # Always pick the first of the tied endpoints, i.e. the slow one, as primary
+    monkeypatch.setattr(ollama_balancer.random, "choice", lambda seq: seq[0])
+    with MockOllamaServer(responder=lambda p: "slow", latency=2.0) as slow, MockOllamaServer(
+        responder=lambda p: "fast"
+    ) as fast:
+        balancer = OllamaBalancer([slow.url, fast.url], hedge_initial_delay=0.05)
+        started = time.monotonic()
+        assert balancer.generate("hi") == "fast"
+        assert time.monotonic() - started < 1.0
+
+        stats = balancer.stats()
+        assert stats["hedges_sent"] == 1 and stats["hedges_won"] == 1
+
+        # The losing duplicate is aborted, not left running, and not blamed
+        slow_endpoint = balancer.endpoints[0]
+        deadline = time.monotonic() + 1.0
+        while slow_endpoint.outstanding and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert slow_endpoint.outstanding == 0
+        assert slow_endpoint.failures == 0
+        assert slow_endpoint.breaker.state == CircuitBreaker.CLOSED
+        assert len(balancer._latencies["/api/generate"]) == 1  # only the winner
+
+
+def test_hedging_disabled_sends_one_request(monkeypatch):
+    monkeypatch.setattr(ollama_balancer.random, "choice", lambda seq: seq[0])
+    with MockOllamaServer(latency=0.2) as slow, MockOllamaServer() as fast:
+        balancer = OllamaBalancer([slow.url, fast.url], hedge=False, hedge_initial_delay=0.01)
+        balancer.generate("hi")
+        assert slow.requests == 1 and fast.requests == 0
+        assert balancer.stats()["hedges_sent"] == 0
+
+
+# --- configuration and fork safety -------------------------------------------------------
+
+
+def test_default_options_from_env(monkeypatch):
+    monkeypatch.setenv("OLLAMA_TIMEOUT", "30")
+    monkeypatch.setenv("OLLAMA_MAX_RETRIES", "4")
+    monkeypatch.setenv("OLLAMA_HEDGE", "0")
+    monkeypatch.setenv("OLLAMA_HEDGE_INITIAL_DELAY", "1.5")
+    assert default_options() == {
+        "timeout": 30.0,
+        "max_retries": 4,
+        "hedge": False,
+        "hedge_initial_delay": 1.5,
+    }
+    monkeypatch.setenv("OLLAMA_TIMEOUT", "0")
+    assert default_options()["timeout"] is None
+
+
+def test_defaults_have_no_timeout_and_no_blind_hedging():
+    balancer = OllamaBalancer(["http://a", "http://b"])
+    assert balancer.timeout is None
+    assert balancer.hedge_delay("/api/generate") is None
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_balancer_works_in_forked_child():
+    with MockOllamaServer(responder=lambda payload: "ok") as server:
+        balancer = OllamaBalancer([server.url], hedge=False)
+        assert balancer.generate("warm up the pool") == "ok"
+
+        pid = os.fork()
+        if pid == 0:  # child: the inherited pool has no threads until reset
+            try:
+                ok = balancer.generate("from the child") == "ok"
+            finally:
+                os._exit(0 if ok else 1)
+
+        deadline = time.monotonic() + 10.0
+        while True:
+            done_pid, status = os.waitpid(pid, os.WNOHANG)
+            if done_pid:
+                break
+            if time.monotonic() > deadline:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                pytest.fail("generate() hung in the forked child")
+            time.sleep(0.05)
+        assert os.waitstatus_to_exitcode(status) == 0
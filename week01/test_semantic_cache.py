@@ -0,0 +1,219 @@
+"""
+week01/test_semantic_cache.py
+
+Tests for the semantic answer cache. Embeddings come from the mock's
+bag-of-words embedder (or MockOllamaServer for the end-to-end check).
+
+Run from the repo root:
+
+    python -m pytest -q week01/test_semantic_cache.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import ollama_balancer
+import semantic_cache
+from mock_ollama import MockOllamaServer, bag_of_words_embedding
+from ollama_balancer import OllamaBalancer
+from semantic_cache import SemanticCache
+
+
+class FakeClock:
+    """Stands in for time.time so TTL and LRU order are deterministic."""
+
+    def __init__(self, now: float = 1_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(semantic_cache.time, "time", fake)
+    return fake
+
+
+def make_cache(**options) -> SemanticCache:
+    options.setdefault("embed_fn", bag_of_words_embedding)
+    return SemanticCache(**options)
+
+
+# --- hits and misses ------------------------------------------------------------
+
+
+def test_paraphrase_hits_and_unrelated_query_misses():
+    cache = make_cache()
+    cache.put("What is an AI agent?", "An agent perceives and acts.")
+
+    assert cache.lookup("what's an ai agent") == "An agent perceives and acts."
+    assert cache.lookup("how do I bake bread") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate == 0.5
+
+
+def test_namespaces_are_separate():
+    cache = make_cache()
+    cache.put("what is langgraph", "graph answer", namespace="llm_node:llama3")
+    assert cache.lookup("what is langgraph", namespace="llm_node:mistral") is None
+    assert cache.lookup("what is langgraph", namespace="llm_node:llama3") == "graph answer"
+
+
+def test_put_overwrites_same_query():
+    cache = make_cache()
+    cache.put("what is react", "old")
+    cache.put("What is ReAct?", "new")
+    assert cache.lookup("what is react") == "new"
+    assert cache.stats()["entries"] == 1
+
+
+def test_miss_then_put_embeds_once():
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        return bag_of_words_embedding(text)
+
+    cache = make_cache(embed_fn=embed)
+    cache.put("warm up", "x")
+    calls.clear()
+    assert cache.lookup("what is an ai agent") is None
+    cache.put("what is an ai agent", "answer")
+    assert calls == ["what is an ai agent"]
+
+
+def test_embedding_failure_is_a_miss():
+    def broken(text):
+        raise ConnectionError("Ollama down")
+
+    cache = make_cache(embed_fn=broken)
+    cache.put("q", "a")
+    assert cache.lookup("q") is None
+    assert cache.stats()["embed_errors"] == 1
+
+
+def test_disabled_cache_never_hits_or_stores():
+    cache = make_cache(enabled=False)
+    cache.put("what is an ai agent", "answer")
+    assert cache.lookup("what is an ai agent") is None
+    assert cache.stats()["entries"] == 0
+
+
+# --- TTL and capacity -------------------------------------------------------------
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = make_cache(default_ttl=60)
+    cache.put("what is an ai agent", "short-lived", ttl=10)
+    cache.put("what is langgraph", "long-lived")
+
+    clock.advance(11)
+    assert cache.lookup("what is an ai agent") is None
+    assert cache.lookup("what is langgraph") == "long-lived"
+    assert cache.stats()["expirations"] == 1
+
+    clock.advance(60)
+    assert cache.lookup("what is langgraph") is None
+
+
+def test_full_cache_evicts_least_recently_used(clock):
+    cache = make_cache(capacity=3)
+    for query in ("alpha question", "beta question", "gamma question"):
+        cache.put(query, query.upper())
+        clock.advance(1)
+
+    assert cache.lookup("alpha question") == "ALPHA QUESTION"  # now the most recent
+    clock.advance(1)
+    cache.put("delta question", "DELTA QUESTION")
+
+    assert cache.lookup("beta question") is None
+    for query in ("alpha question", "gamma question", "delta question"):
+        assert cache.lookup(query) == query.upper()
+    assert cache.stats()["evictions"] == 1
+
+
+def test_full_cache_reuses_expired_rows_first(clock):
+    cache = make_cache(capacity=2)
+    cache.put("alpha question", "A", ttl=5)
+    cache.put("beta question", "B", ttl=100)
+    clock.advance(10)
+    cache.put("gamma question", "C")
+
+    assert cache.lookup("beta question") == "B"
+    assert cache.lookup("gamma question") == "C"
+    assert cache.stats()["evictions"] == 0
+
+
+# --- IVF partitions -----------------------------------------------------------------
+
+
+def test_ivf_index_keeps_recall():
+    queries = [f"topic{i} detail{i * 7} subject{i % 13}" for i in range(300)]
+    cache = make_cache(capacity=512, n_lists=4, n_probe=2)
+    for i, query in enumerate(queries):
+        cache.put(query, f"answer {i}")
+
+    assert cache.stats()["ivf_lists"] == 4
+    found = sum(cache.lookup(query) == f"answer {i}" for i, query in enumerate(queries))
+    assert found / len(queries) >= 0.95
+
+
+# --- persistence ---------------------------------------------------------------------
+
+
+def test_flush_and_reload(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    first = make_cache(path=path, capacity=64)
+    assert first.persistent
+    first.put("what is an ai agent", "persisted answer", namespace="study")
+    first.close()
+
+    second = make_cache(path=path, capacity=64)
+    assert second.persistent
+    assert second.lookup("what's an AI agent?", namespace="study") == "persisted answer"
+    second.close()
+
+
+def test_second_owner_of_a_path_stays_in_memory(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    owner = make_cache(path=path, capacity=64)
+    other = make_cache(path=path, capacity=64)
+    assert owner.persistent and not other.persistent
+
+    owner.put("what is langgraph", "LangGraph answer")
+    other.put("how do I bake bread", "bread answer")
+    assert owner.lookup("how do I bake bread") is None
+    assert other.lookup("how do I bake bread") == "bread answer"
+    assert other.lookup("what is langgraph") is None
+    owner.close()
+
+
+def test_reload_rejects_different_capacity(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    first = make_cache(path=path, capacity=64)
+    first.put("q", "a")
+    first.close()
+    with pytest.raises(ValueError, match="capacity"):
+        make_cache(path=path, capacity=128)
+
+
+# --- end to end through the Ollama API ---------------------------------------------
+
+
+def test_default_embedder_goes_through_ollama(monkeypatch):
+    with MockOllamaServer() as server:
+        monkeypatch.setattr(
+            ollama_balancer, "_DEFAULT_BALANCER", OllamaBalancer([server.url], hedge=False)
+        )
+        cache = SemanticCache()
+        cache.put("What is an AI agent?", "answer")
+        assert cache.lookup("what is an ai agent") == "answer"
+        assert server.requests == 2  # one /api/embeddings call per distinct text
@@ -0,0 +1,15 @@
+"""
+week01/token_utils.py
+
+Rough token counting shared by the mock Ollama server (prompt_eval_count /
+eval_count) and the LangGraph Conversation.
+"""
+
+import re
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count: words and punctuation marks."""
+    return len(_TOKEN_RE.findall(text))
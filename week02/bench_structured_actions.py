@@ -0,0 +1,127 @@
+"""
+week02/bench_structured_actions.py
+
+Text protocol vs JSON-schema actions, on the mock Ollama backend.
+
+The mock plays a model with typical habits:
+- text protocol: sometimes answers in prose with no Action / Final Answer,
+  sometimes writes a malformed action like calculator(2+3), and likes to
+  invent its own "Observation:" lines after an action.
+- JSON mode (format=schema): mostly valid objects, some near misses
+  (code fences, "tool"/"input" keys, capitalised tool names), a little garbage.
+
+Reports answered queries, average LLM steps per query and total tokens.
+
+Read the numbers with care: this is a simulation, not a measurement of a
+real model. The failure rates are written into simulated_model below
+(20% prose and 10% malformed actions for text, 5% garbage and 10% near
+misses for JSON), so the gap in answered queries follows directly from
+those assumptions. What the bench does measure is the cost side of the
+protocol on the same assumptions: JSON mode takes more LLM steps (and
+tokens) per query. A successful run is two steps in both modes, but an
+unparseable text reply ends the run after one step, while a rejected
+JSON reply is sent back to the model and costs another step. Measure
+against a real model before drawing conclusions about answer rates.
+
+Run from the repo root:
+
+    python week02/bench_structured_actions.py
+"""
+
+import contextlib
+import io
+import json
+import random
+import sys
+import os
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'week01'))
+from mock_ollama import MockOllamaServer
+from ollama_balancer import configure_endpoints
+from react_agent import run_react_agent
+
+
+N_QUERIES = 200
+
+QUESTIONS = [
+    ("What is 12*7?", "calculator", "12*7"),
+    ("Compute (3+4)*5 please", "calculator", "(3+4)*5"),
+    ("How much is 144/12?", "calculator", "144/12"),
+    ("What is an AI agent?", "kb_lookup", "ai agent"),
+    ("Explain LangGraph", "kb_lookup", "langgraph"),
+    ("Tell me about the ReAct pattern", "kb_lookup", "react pattern"),
+]
+
+
+def simulated_model(payload) -> str:
+    prompt = payload["prompt"]
+    rng = random.Random(zlib.crc32(prompt.encode("utf-8")))
+    tail = prompt.split("User question:", 1)[1]
+    question = tail.strip().splitlines()[0].strip()
+    tool, argument = next((t, a) for q, t, a in QUESTIONS if q == question)
+    observed = "Observation:" in tail
+    final = f"Based on the {tool} result, here is the answer to: {question}"
+    roll = rng.random()
+
+    if "format" in payload:
+        if roll < 0.05:
+            return "I think I should use a tool for this one."
+        if observed:
+            step = {"thought": "I have what I need.", "action": "final_answer", "argument": final}
+        else:
+            step = {"thought": f"I should use {tool}.", "action": tool, "argument": argument}
+        if roll < 0.15:
+            near_miss = {"reasoning": step["thought"], "tool": step["action"].title(), "input": step["argument"]}
+            return "```json\n" + json.dumps(near_miss, indent=2) + "\n```"
+        return json.dumps(step)
+
+    if roll < 0.2:
+        return (
+            "Sure! That's a great question. Let me explain it in detail without "
+            "following the requested format, because prose feels more natural here."
+        )
+    if observed:
+        return f"Thought: I have the observation.\nFinal Answer: {final}"
+    if roll < 0.3:
+        return f"Thought: I will use {tool}.\nAction: {tool}({argument})"
+    return (
+        f"Thought: I should use {tool} to answer this.\n"
+        f"Action: {tool}[{argument}]\n"
+        "Observation: (the model guesses a result here, which the agent discards)\n"
+        "Thought: That looks right, so I can answer now.\n"
+        f"Final Answer: {final}"
+    )
+
+
+def run_mode(server: MockOllamaServer, structured: bool) -> dict:
+    server.reset_counters()
+    answered = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(N_QUERIES):
+            question = QUESTIONS[i % len(QUESTIONS)][0]
+            # Vary the prompt a little so the simulated model's "mood" varies too
+            answer = run_react_agent(question + " " * (i // len(QUESTIONS)), structured=structured)
+            answered += answer.startswith("Based on")
+    tokens = server.prompt_tokens + server.eval_tokens
+    return {
+        "answered": answered,
+        "steps": server.requests / N_QUERIES,
+        "tokens": tokens,
+        "tokens_per_answer": tokens / answered if answered else float("inf"),
+    }
+
+
+if __name__ == "__main__":
+    with MockOllamaServer(responder=simulated_model) as server:
+        configure_endpoints([server.url], hedge=False)
+        text = run_mode(server, structured=False)
+        structured = run_mode(server, structured=True)
+
+    print(f"=== {N_QUERIES} queries on the mock backend ===\n")
+    print(f"{'':22}{'answered':>10}{'steps/query':>14}{'total tokens':>15}{'tokens/answer':>15}")
+    for label, r in (("text protocol", text), ("JSON-schema actions", structured)):
+        print(
+            f"{label:22}{r['answered']:>10}{r['steps']:>14.2f}"
+            f"{r['tokens']:>15}{r['tokens_per_answer']:>15.0f}"
+        )
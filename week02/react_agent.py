@@ -1,14 +1,26 @@
+import difflib
+import json
 import re
-from typing import Dict, Callable
+from typing import Dict, Callable, Optional, Tuple
 
 import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'week01'))
-from simple_llm import call_ollama_llm
+sys.path.insert(0, os.path.dirname(__file__))
+from simple_llm import OllamaError, call_ollama_llm
+from tool_cache import TOOL_CACHE, normalize_expression
 
 
 #------------Tools------------#
 
+# Tool results are memoized in TOOL_CACHE (see tool_cache.py):
+# pure tools are reused across runs, write_note always runs.
+
+@TOOL_CACHE.cached(
+    "calculator",
+    normalize=normalize_expression,
+    cache_if=lambda result: not result.startswith("Error in calculation"),
+)
 def calculator(expression: str) -> str:
     """A simple calculator tool that evaluates basic arithmetic expressions. Example: "2+3*4"""
     try:
@@ -28,6 +40,7 @@ KNOWLEDGE_BASE = {
                  "define LLM workflows as graphs with state, nodes, and edges."
 }
 
+@TOOL_CACHE.cached("kb_lookup", ttl=3600, invalidate_on=("kb_reload",))
 def knowledge_base_lookup(query: str) -> str:
     """A simple lookup in a small in-memory knowledge base."""
     q = query.lower().strip()
@@ -38,10 +51,19 @@ def knowledge_base_lookup(query: str) -> str:
             "I don't have an exact answer in my small knowledge base yet."
             "Try asking about 'AI agent', 'ReAct pattern', or 'Langgraph'."
         )
+
+
+def reload_knowledge_base(entries: Dict[str, str]) -> None:
+    """Replace the knowledge base contents and drop cached kb_lookup results."""
+    KNOWLEDGE_BASE.clear()
+    KNOWLEDGE_BASE.update({key.lower(): value for key, value in entries.items()})
+    TOOL_CACHE.notify("kb_reload")
+
     
 NOTES_DIR = "notes/react_notes"
 
 
+@TOOL_CACHE.cached("write_note", pure=False)
 def write_note(argument: str) -> str:
     """
     Write a note to a markdown file.
@@ -83,6 +105,39 @@ TOOLS: Dict[str, Callable[[str], str]] = {
     }
 
 
+def call_tool(
+    tool_name: str, argument: str, seen_actions: Dict[Tuple[str, str], Tuple[str, int]]
+) -> str:
+    """
+    Run one tool for the ReAct loop.
+    Repeating a pure action already taken in this run (same tool, same
+    normalised argument) is short-circuited: the tool is not re-run and the
+    Observation is a short pointer back instead of the full result again.
+    Impure tools (write_note) always run, and an action whose tool was
+    invalidated since (e.g. after a knowledge-base reload) runs again.
+    """
+    tool = TOOLS.get(tool_name)
+    if tool is None:
+        return f"Unknown tool: {tool_name}"
+
+    policy = TOOL_CACHE.policies.get(tool_name)
+    if policy is None or not policy.pure:
+        return tool(argument)
+
+    key = TOOL_CACHE.key(tool_name, argument)
+    generation = TOOL_CACHE.generation(tool_name)
+    seen = seen_actions.get(key)
+    if seen is not None and seen[1] == generation:
+        return (
+            f"Already done: see the earlier Observation for {tool_name}[{seen[0]}]. "
+            "Use that result instead of repeating the action."
+        )
+
+    observation = tool(argument)
+    seen_actions[key] = (argument, generation)
+    return observation
+
+
 #------------React Agent Core------------#
 
 REACT_INSTRUCTIONS = """You are a helpful AI agent that used ReAct (Reason + Act).
@@ -118,19 +173,25 @@ def parse_action(line:str):
     argument = match.group(2).strip()
     return tool_name, argument
 
-def run_react_agent(user_query: str, max_steps: int = 5) -> str:
+def run_react_agent(user_query: str, max_steps: int = 5, structured: bool = False) -> str:
     """
     Main ReAct loop:
     - Ask LLM for next Thought/Action or Final Answer.
     - If Action is present, call the tool and append a real Observation.
     - Repeat until Final Answer or max_steps or write_note_calls limit.
+
+    structured=True switches to JSON-schema actions (run_structured_react_agent).
     """
+    if structured:
+        return run_structured_react_agent(user_query, max_steps=max_steps)
+
     print("DEBUG: run_react_agent version WITH cut-off logic is running")
 
     history = REACT_INSTRUCTIONS + f"\n\nUser question: {user_query}\n"
 
     write_note_calls = 0
     MAX_WRITE_NOTE_CALLS = 3  # after this, we stop and return a final answer
+    seen_actions: Dict[Tuple[str, str], Tuple[str, int]] = {}  # (tool, key) -> (arg, generation)
 
     for step in range(max_steps):
         # If we've already written the note enough times, stop here
@@ -169,13 +230,9 @@ def run_react_agent(user_query: str, max_steps: int = 5) -> str:
                 )
 
             print(f"DEBUG: About to call tool '{tool_name}' with argument: {argument!r}")
-            tool = TOOLS.get(tool_name)
-            if tool is None:
-                observation = f"Unknown tool: {tool_name}"
-            else:
-                observation = tool(argument)
-                if tool_name == "write_note":
-                    write_note_calls += 1
+            observation = call_tool(tool_name, argument, seen_actions)
+            if tool_name == "write_note":
+                write_note_calls += 1
             print("DEBUG: Tool returned observation:", observation)
 
             # Keep only up to the Action line, then append OUR observation
@@ -210,9 +267,225 @@ def run_react_agent(user_query: str, max_steps: int = 5) -> str:
         "Your note should be saved in 'notes/react_notes/ai_agents.md'."
     )
 
+#------------Structured (JSON schema) actions------------#
+
+# Instead of hoping the model writes exactly "Action: tool[arg]", we ask Ollama
+# for JSON that matches a schema built from the TOOLS registry. Every step is
+# one object: {"thought": ..., "action": <tool name or "final_answer">, "argument": ...}
+
+FINAL_ANSWER_ACTION = "final_answer"
+
+# Per-tool argument checks; a failed check becomes an Observation, not a crash.
+ARGUMENT_VALIDATORS: Dict[str, Callable[[str], Optional[str]]] = {
+    "calculator": lambda arg: (
+        None if re.fullmatch(r"[\d\s+\-*/().%]+", arg) else "only numbers and + - * / % ( ) are allowed"
+    ),
+    "write_note": lambda arg: None if "|" in arg else "expected 'title | content'",
+}
+
+# Keys a model tends to use instead of ours (cheap repair pass)
+_KEY_ALIASES = {
+    "reasoning": "thought",
+    "thoughts": "thought",
+    "tool": "action",
+    "tool_name": "action",
+    "name": "action",
+    "input": "argument",
+    "tool_input": "argument",
+    "args": "argument",
+    "arg": "argument",
+    "arguments": "argument",
+    "query": "argument",
+    "expression": "argument",
+    "answer": "argument",
+    "final_answer": "argument",
+}
+
+# Aliased keys that also tell us the action: {"final_answer": "42"} means
+# action=final_answer even when the model left "action" out.
+_FINAL_ANSWER_KEYS = {"answer", "final_answer"}
+
+
+def tool_description(name: str) -> str:
+    """First line of a tool's docstring."""
+    doc = (TOOLS[name].__doc__ or "").strip()
+    return doc.splitlines()[0].strip() if doc else name
+
+
+def build_action_schema() -> Dict:
+    """JSON schema for one ReAct step, generated from the TOOLS registry."""
+    return {
+        "type": "object",
+        "properties": {
+            "thought": {"type": "string"},
+            "action": {"type": "string", "enum": list(TOOLS) + [FINAL_ANSWER_ACTION]},
+            "argument": {"type": "string"},
+        },
+        "required": ["thought", "action", "argument"],
+    }
+
+
+def build_structured_instructions() -> str:
+    tool_lines = "\n".join(f"- {name}: {tool_description(name)}" for name in TOOLS)
+    return f"""You are a helpful AI agent that uses ReAct (Reason + Act).
+You can use the following tools:
+{tool_lines}
+
+Reply with ONE JSON object per step:
+{{"thought": "your reasoning", "action": "<tool name>", "argument": "<tool input>"}}
+
+write_note takes "title | content" as its argument.
+After each step you will see an Observation with the tool result.
+When you can answer the user, reply with:
+{{"thought": "...", "action": "{FINAL_ANSWER_ACTION}", "argument": "your final answer"}}
+"""
+
 
-def interactive_loop():
-    print("=== ReAct Agent (Ollama) ===")
+def _extract_json_object(text: str) -> Optional[Dict]:
+    """
+    Strict parse first, then a cheap repair: strip code fences / prose around
+    the outermost {...} and drop trailing commas.
+    """
+    try:
+        obj = json.loads(text)
+        return obj if isinstance(obj, dict) else None
+    except json.JSONDecodeError:
+        pass
+
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    candidate = re.sub(r",\s*([}\]])", r"\1", text[start:end + 1])
+    try:
+        obj = json.loads(candidate)
+    except json.JSONDecodeError:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+def parse_structured_action(text: str) -> Tuple[str, str, str]:
+    """
+    Turn a model reply into (thought, action, argument).
+    Near misses are repaired: aliased keys, tool-name typos/casing,
+    non-string arguments, or a reply in the old text protocol.
+    Raises ValueError when the reply can't be salvaged.
+    """
+    obj = _extract_json_object(text)
+
+    if obj is None:
+        # Fall back to the text protocol
+        for line in text.splitlines():
+            if line.strip().startswith("Action:"):
+                tool_name, argument = parse_action(line.strip())
+                if tool_name is not None:
+                    obj = {"action": tool_name, "argument": argument}
+                    break
+        else:
+            final_match = re.search(r"Final Answer:(.*)", text, re.DOTALL)
+            if final_match:
+                obj = {"action": FINAL_ANSWER_ACTION, "argument": final_match.group(1)}
+    if obj is None:
+        raise ValueError("reply is not a JSON object")
+
+    # Our own keys win over aliases, whatever order the model wrote them in
+    keys = {str(key).strip().lower().replace(" ", "_"): value for key, value in obj.items()}
+    fields = {key: keys[key] for key in ("thought", "action", "argument") if key in keys}
+    for key, value in keys.items():
+        fields.setdefault(_KEY_ALIASES.get(key, key), value)
+    if "action" not in fields and _FINAL_ANSWER_KEYS & keys.keys():
+        fields["action"] = FINAL_ANSWER_ACTION
+
+    action = str(fields.get("action", "")).strip().lower().replace(" ", "_")
+    if action in ("final", "answer", "finish"):
+        action = FINAL_ANSWER_ACTION
+    choices = list(TOOLS) + [FINAL_ANSWER_ACTION]
+    if action not in choices:
+        close = difflib.get_close_matches(action, choices, n=1, cutoff=0.75)
+        if not close:
+            raise ValueError(f"unknown action {fields.get('action')!r}; choose one of {choices}")
+        action = close[0]
+
+    argument = fields.get("argument", "")
+    if isinstance(argument, dict) and len(argument) == 1:
+        argument = next(iter(argument.values()))
+    if not isinstance(argument, str):
+        argument = json.dumps(argument) if isinstance(argument, (dict, list)) else str(argument)
+    argument = argument.strip()
+    if not argument:
+        raise ValueError(f"empty argument for {action}")
+
+    validator = ARGUMENT_VALIDATORS.get(action)
+    problem = validator(argument) if validator else None
+    if problem:
+        raise ValueError(f"invalid argument for {action}: {problem}")
+
+    return str(fields.get("thought", "")).strip(), action, argument
+
+
+# How much of a rejected reply is echoed back into the prompt
+MAX_REJECTED_CHARS = 200
+
+
+def run_structured_react_agent(user_query: str, max_steps: int = 5) -> str:
+    """
+    ReAct loop using Ollama's JSON-schema output instead of the text protocol.
+    An invalid step becomes an Observation telling the model what went wrong,
+    so a formatting slip costs one step instead of ending the run.
+    """
+    schema = build_action_schema()
+    history = build_structured_instructions() + f"\n\nUser question: {user_query}\n"
+
+    write_note_calls = 0
+    MAX_WRITE_NOTE_CALLS = 3
+    seen_actions: Dict[Tuple[str, str], Tuple[str, int]] = {}
+
+    for step in range(max_steps):
+        if write_note_calls >= MAX_WRITE_NOTE_CALLS:
+            return (
+                "I've created and updated your note several times. "
+                "You can read it in 'notes/react_notes/ai_agents.md'."
+            )
+
+        prompt = history + "\nReply with the next step as JSON.\n"
+        llm_response = call_ollama_llm(prompt, format=schema)
+
+        print(f"\n--- LLM Step {step + 1} (structured) ---")
+        print(llm_response)
+        print("-------------------------\n")
+
+        try:
+            thought, action, argument = parse_structured_action(llm_response)
+        except ValueError as e:
+            # Show the model what it sent (trimmed), then why it was rejected
+            rejected = " ".join(llm_response.split())
+            if len(rejected) > MAX_REJECTED_CHARS:
+                rejected = rejected[:MAX_REJECTED_CHARS] + "..."
+            history += (
+                f"Rejected reply: {rejected}\n"
+                f"Invalid step: {e}. Reply with one JSON object matching the schema.\n"
+            )
+            continue
+
+        if action == FINAL_ANSWER_ACTION:
+            return argument
+
+        observation = call_tool(action, argument, seen_actions)
+        if action == "write_note":
+            write_note_calls += 1
+        print("DEBUG: Tool returned observation:", observation)
+
+        # Echo the step back in the format we ask for, not the text protocol
+        step_json = json.dumps({"thought": thought, "action": action, "argument": argument})
+        history += f"{step_json}\nObservation: {observation}\n"
+
+    return (
+        "I've reached my reasoning step limit. "
+        "Your note should be saved in 'notes/react_notes/ai_agents.md'."
+    )
+
+
+def interactive_loop(structured: bool = False):
+    print(f"=== ReAct Agent (Ollama{', JSON actions' if structured else ''}) ===")
     print("Tools: calculator, kb_lookup")
     print("Type 'exit' to quit.\n")
 
@@ -224,9 +497,13 @@ def interactive_loop():
         if not query:
             continue
             
-        answer = run_react_agent(query)
+        try:
+            answer = run_react_agent(query, structured=structured)
+        except OllamaError as e:
+            print(f"\nAgent stopped, the LLM is unavailable: {e}\n")
+            continue
         print(f"\nFinal Answer: {answer}\n")
 
 if __name__ == "__main__":
-    interactive_loop()
+    interactive_loop(structured="--structured" in sys.argv)
     
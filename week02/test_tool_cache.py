@@ -0,0 +1,188 @@
+"""
+week02/test_tool_cache.py
+
+Tests for the tool-result cache and how the ReAct loop uses it.
+
+Run from the repo root:
+
+    python -m pytest -q week02/test_tool_cache.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "week01"))
+sys.path.insert(0, os.path.dirname(__file__))
+import ollama_balancer
+import react_agent
+import tool_cache
+from mock_ollama import MockOllamaServer
+from ollama_balancer import OllamaBalancer
+from tool_cache import ToolCache, normalize_expression, normalize_text
+
+
+@pytest.fixture
+def clean_agent(monkeypatch, tmp_path):
+    """Empty shared tool cache, original knowledge base, notes under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(react_agent, "KNOWLEDGE_BASE", dict(react_agent.KNOWLEDGE_BASE))
+    react_agent.TOOL_CACHE.invalidate()
+    yield
+    react_agent.TOOL_CACHE.invalidate()
+
+
+# --- keys ---------------------------------------------------------------------------
+
+
+def test_normalize_text():
+    assert normalize_text("  What is an   AI agent?") == "what is an ai agent"
+    assert normalize_text("Explain LangGraph!") == normalize_text("explain langgraph")
+
+
+def test_normalize_expression_collapses_but_keeps_whitespace():
+    assert normalize_expression(" 2 +  3 ") == normalize_expression("2 + 3")
+    assert normalize_expression("1 2") != normalize_expression("12")
+
+
+def test_key_uses_the_tool_normalizer():
+    cache = ToolCache()
+    cache.cached("calc", normalize=normalize_expression)(lambda arg: arg)
+    assert cache.key("calc", "2  + 3") == ("calc", "2 + 3")
+    assert cache.key("unregistered", "  Raw ") == ("unregistered", "Raw")
+
+
+# --- caching --------------------------------------------------------------------------
+
+
+def counting_tool(cache: ToolCache, name: str = "tool", **policy):
+    calls = []
+
+    @cache.cached(name, **policy)
+    def tool(argument: str) -> str:
+        calls.append(argument)
+        return f"result for {argument}"
+
+    return tool, calls
+
+
+def test_pure_tool_is_memoized_across_paraphrases():
+    cache = ToolCache()
+    tool, calls = counting_tool(cache)
+    assert tool("What is an AI agent?") == tool("what is an ai agent")
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_impure_tool_always_runs():
+    cache = ToolCache()
+    tool, calls = counting_tool(cache, pure=False)
+    tool("note")
+    tool("note")
+    assert len(calls) == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(tool_cache.time, "monotonic", lambda: now[0])
+    cache = ToolCache()
+    tool, calls = counting_tool(cache, ttl=10)
+    tool("q")
+    now[0] += 5
+    tool("q")
+    now[0] += 6
+    tool("q")
+    assert len(calls) == 2
+
+
+def test_lru_eviction():
+    cache = ToolCache(max_entries=2)
+    tool, calls = counting_tool(cache)
+    tool("a")
+    tool("b")
+    tool("a")  # "a" is now the most recently used
+    tool("c")  # evicts "b"
+    tool("a")
+    tool("b")
+    assert calls == ["a", "b", "c", "b"]
+    assert cache.stats()["evictions"] == 2
+
+
+def test_cache_if_keeps_errors_out():
+    cache = ToolCache()
+    tool, calls = counting_tool(cache, cache_if=lambda result: not result.endswith("bad"))
+    tool("bad")
+    tool("bad")
+    tool("good")
+    tool("good")
+    assert calls == ["bad", "bad", "good"]
+
+
+def test_calculator_errors_are_not_cached(clean_agent):
+    assert react_agent.calculator("1 2").startswith("Error in calculation")
+    assert react_agent.calculator("12") == "12"
+    assert react_agent.calculator("1 2").startswith("Error in calculation")
+    assert react_agent.TOOL_CACHE.stats()["entries"] == 1
+
+
+# --- invalidation ------------------------------------------------------------------------
+
+
+def test_notify_invalidates_listeners_only_and_bumps_generation():
+    cache = ToolCache()
+    kb, kb_calls = counting_tool(cache, "kb", invalidate_on=("kb_reload",))
+    calc, calc_calls = counting_tool(cache, "calc")
+    kb("q")
+    calc("1+1")
+    assert cache.generation("kb") == 0
+
+    cache.notify("kb_reload")
+    kb("q")
+    calc("1+1")
+    assert len(kb_calls) == 2 and len(calc_calls) == 1
+    assert cache.generation("kb") == 1 and cache.generation("calc") == 0
+
+    cache.invalidate()
+    assert cache.generation("calc") == 1
+
+
+# --- the ReAct loop ----------------------------------------------------------------------
+
+
+def test_call_tool_short_circuits_pure_repeats_only(clean_agent):
+    seen = {}
+    first = react_agent.call_tool("kb_lookup", "ai agent", seen)
+    assert "perceives" in first
+    assert react_agent.call_tool("kb_lookup", "AI agent", seen).startswith("Already done")
+
+    react_agent.call_tool("write_note", "T | version A", seen)
+    react_agent.call_tool("write_note", "T | version B", seen)
+    react_agent.call_tool("write_note", "T | version A", seen)
+    with open(os.path.join(react_agent.NOTES_DIR, "t.md"), encoding="utf-8") as f:
+        assert f.read().endswith("version A")
+
+
+def test_reload_knowledge_base_mid_run(clean_agent, monkeypatch):
+    prompts = []
+
+    def model(payload):
+        prompts.append(payload["prompt"])
+        step = len(prompts)
+        if step == 1:
+            return "Thought: look it up.\nAction: kb_lookup[ai agent]"
+        if step == 2:
+            react_agent.reload_knowledge_base({"ai agent": "Updated definition of an agent."})
+            return "Thought: look it up again.\nAction: kb_lookup[ai agent]"
+        return "Thought: done.\nFinal Answer: ok"
+
+    with MockOllamaServer(responder=model) as server:
+        monkeypatch.setattr(
+            ollama_balancer, "_DEFAULT_BALANCER", OllamaBalancer([server.url], hedge=False)
+        )
+        assert react_agent.run_react_agent("What is an AI agent?") == "ok"
+
+    last_prompt = prompts[-1]
+    assert "Observation: Updated definition of an agent." in last_prompt
+    assert "Already done" not in last_prompt
@@ -0,0 +1,188 @@
+"""
+week02/tool_cache.py
+
+Memoized tool results for the ReAct agent (and the LangGraph tool node).
+
+- Each tool declares a policy when it is decorated: pure or not, a TTL,
+  how to normalise its argument, and which events invalidate it.
+- Arguments are normalised before keying, so "2 +  3" and " 2 + 3" (or
+  "What is an AI agent?" and "what is an ai agent") share one entry.
+- A tool can refuse to cache some results (e.g. calculator errors).
+- Storage is a bounded LRU (OrderedDict), shared across runs.
+- notify(event) drops the entries of every tool listening for that event,
+  e.g. "kb_reload" when the knowledge base changes.
+  Each invalidation bumps the tool's generation, so callers holding on to
+  earlier results (like the ReAct loop's per-run repeat check) can tell
+  they are stale.
+
+Usage:
+
+    TOOL_CACHE = ToolCache(max_entries=512)
+
+    @TOOL_CACHE.cached("kb_lookup", ttl=3600, invalidate_on=("kb_reload",))
+    def kb_lookup(query: str) -> str:
+        ...
+"""
+
+import functools
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+
+def normalize_text(argument: str) -> str:
+    """Case/whitespace-insensitive key; trailing punctuation ignored."""
+    return re.sub(r"\s+", " ", argument.strip().lower()).rstrip("?!. ")
+
+
+def normalize_expression(argument: str) -> str:
+    """
+    Key for math expressions: runs of whitespace become one space.
+    Whitespace isn't removed, since "1 2" (an error) and "12" differ.
+    """
+    return re.sub(r"\s+", " ", argument.strip())
+
+
+@dataclass
+class ToolPolicy:
+    pure: bool = True  # same argument -> same result, safe to reuse
+    ttl: Optional[float] = None  # seconds; None = until evicted/invalidated
+    normalize: Callable[[str], str] = normalize_text
+    cache_if: Callable[[str], bool] = lambda result: True  # which results to keep
+
+
+class ToolCache:
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.policies: Dict[str, ToolPolicy] = {}
+        self._listeners: Dict[str, Set[str]] = {}  # event -> tool names
+        self._generations: Dict[str, int] = {}  # tool name -> invalidation count
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # --- registration -----------------------------------------------------------
+
+    def cached(
+        self,
+        name: str,
+        pure: bool = True,
+        ttl: Optional[float] = None,
+        normalize: Callable[[str], str] = normalize_text,
+        invalidate_on: Iterable[str] = (),
+        cache_if: Callable[[str], bool] = lambda result: True,
+    ):
+        """
+        Decorator for a tool `fn(argument: str) -> str`.
+        Impure tools are registered (for key normalisation and events)
+        but always executed. cache_if(result) -> False keeps a result out
+        of the cache (e.g. an error message).
+        """
+        self.policies[name] = ToolPolicy(
+            pure=pure, ttl=ttl, normalize=normalize, cache_if=cache_if
+        )
+        for event in invalidate_on:
+            self.on(event, name)
+
+        def decorator(fn: Callable[[str], str]) -> Callable[[str], str]:
+            @functools.wraps(fn)
+            def wrapper(argument: str) -> str:
+                policy = self.policies[name]
+                if not policy.pure:
+                    return fn(argument)
+
+                key = self.key(name, argument)
+                found, value = self._get(key)
+                if found:
+                    return value
+                value = fn(argument)
+                if policy.cache_if(value):
+                    self._put(key, value, policy.ttl)
+                return value
+
+            wrapper.tool_name = name
+            return wrapper
+
+        return decorator
+
+    def key(self, name: str, argument: str) -> Tuple[str, str]:
+        """Normalised (tool, argument) key; also used for per-run short-circuiting."""
+        policy = self.policies.get(name)
+        return name, policy.normalize(argument) if policy else argument.strip()
+
+    # --- storage ------------------------------------------------------------------
+
+    def _get(self, key: Tuple[str, str]) -> Tuple[bool, Optional[str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def _put(self, key: Tuple[str, str], value: str, ttl: Optional[float]) -> None:
+        expires_at = float("inf") if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # --- invalidation -------------------------------------------------------------
+
+    def generation(self, name: str) -> int:
+        """Changes whenever the tool's results are invalidated."""
+        with self._lock:
+            return self._generations.get(name, 0)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Drop every cached result (or only those of one tool)."""
+        with self._lock:
+            for tool in self.policies if name is None else (name,):
+                self._generations[tool] = self._generations.get(tool, 0) + 1
+            if name is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                stale = [key for key in self._entries if key[0] == name]
+                for key in stale:
+                    del self._entries[key]
+                dropped = len(stale)
+            self.invalidations += dropped
+
+    def on(self, event: str, *names: str) -> None:
+        """Invalidate these tools whenever `event` is notified."""
+        self._listeners.setdefault(event, set()).update(names)
+
+    def notify(self, event: str) -> None:
+        for name in self._listeners.get(event, ()):
+            self.invalidate(name)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# Shared cache for the Week 2 TOOLS registry
+TOOL_CACHE = ToolCache()
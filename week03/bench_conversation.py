@@ -0,0 +1,134 @@
+"""
+week03/bench_conversation.py
+
+Memory and CPU benchmark: plain list of dataclass messages (the old
+AgentState.messages) vs Conversation, for a 10k-message session.
+
+Run from the repo root:
+
+    python week03/bench_conversation.py
+"""
+
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from week03.conversation import ChatMessage, Conversation
+
+
+N_MESSAGES = 10_000
+N_TURNS = 200  # prompt builds measured on top of the 10k-message session
+
+
+@dataclass
+class PlainChatMessage:
+    """The original, unslotted ChatMessage."""
+
+    role: str
+    content: str
+
+
+def make_contents(n: int):
+    rng = random.Random(0)
+    words = "agent graph state node tool answer question memory prompt token".split()
+    roles = ["user", "tool", "assistant"]
+    return [
+        (roles[i % 3], " ".join(rng.choice(words) for _ in range(rng.randint(10, 40))))
+        for i in range(n)
+    ]
+
+
+def old_render(messages) -> str:
+    # What llm_node / summarize_node used to do on every pass
+    return "\n".join(f"{m.role.upper()}: {m.content}" for m in messages)
+
+
+def old_last_assistant(messages):
+    # What review_node used to do
+    assistant_msgs = [m for m in messages if m.role == "assistant"]
+    return assistant_msgs[-1] if assistant_msgs else None
+
+
+def measure_memory(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+def timed(fn, repeat: int = 1) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    # Each build makes its own copy of every content string, as a live session
+    # does (messages arrive as new strings), so the numbers include the text.
+    contents = make_contents(N_MESSAGES)
+
+    def fresh(text: str) -> str:
+        return text.encode("utf-8").decode("utf-8")
+
+    def build_plain():
+        return [PlainChatMessage(role=r, content=fresh(c)) for r, c in contents]
+
+    def build_slotted():
+        return [ChatMessage(role=r, content=fresh(c)) for r, c in contents]
+
+    def build_conversation():
+        conv = Conversation(ChatMessage(role=r, content=fresh(c)) for r, c in contents)
+        conv.render()
+        return conv
+
+    print(f"=== {N_MESSAGES} messages ===\n")
+    print("Memory (tracemalloc, including message text):")
+    plain_mem = measure_memory(build_plain)
+    slotted_mem = measure_memory(build_slotted)
+    conv_mem = measure_memory(build_conversation)
+    print(f"  list[dataclass ChatMessage]     {plain_mem / 1024:8.0f} KiB")
+    print(f"  list[slotted ChatMessage]       {slotted_mem / 1024:8.0f} KiB")
+    print(f"  Conversation (rendered buffer)  {conv_mem / 1024:8.0f} KiB")
+    print()
+
+    # CPU: a long session where every turn appends a message and rebuilds the prompt
+    plain = build_plain()
+    conv = build_conversation()
+    new_msgs = make_contents(N_TURNS)
+
+    def old_turns():
+        for r, c in new_msgs:
+            plain.append(PlainChatMessage(role=r, content=c))
+            old_render(plain)
+            old_last_assistant(plain)
+
+    def new_turns():
+        for r, c in new_msgs:
+            conv.append(ChatMessage(role=r, content=c))
+            conv.render()
+            conv.last("assistant")
+
+    old_s = timed(old_turns)
+    new_s = timed(new_turns)
+    assert old_render(plain) == conv.render()
+
+    print(f"CPU ({N_TURNS} turns of append + render prompt + last assistant):")
+    print(f"  re-format every message         {old_s * 1000 / N_TURNS:8.3f} ms/turn")
+    print(f"  Conversation incremental        {new_s * 1000 / N_TURNS:8.3f} ms/turn")
+    print(f"  speed-up                        {old_s / new_s:8.1f}x")
+    print()
+
+    lookup_old = timed(lambda: old_last_assistant(plain), repeat=100) / 100
+    lookup_new = timed(lambda: conv.last("assistant"), repeat=100) / 100
+    print("last('assistant') lookup:")
+    print(f"  filtered copy                   {lookup_old * 1e6:8.1f} us")
+    print(f"  role index                      {lookup_new * 1e6:8.3f} us")
@@ -0,0 +1,180 @@
+"""
+week03/conversation.py
+
+Compact chat history for the LangGraph agent.
+
+- ChatMessage is slotted (no per-instance __dict__) and frozen; its role
+  string is interned, so messages share three role objects.
+- Conversation is append-only and stores each message only once, as its
+  rendered line ("ROLE: content") in one growing text buffer, plus a start
+  offset and a role code per message. ChatMessage objects handed to
+  append() are not kept; indexing, iteration and last() rebuild them from
+  the buffer. Building a prompt never re-formats old messages.
+- Token counts are computed lazily, the first time they are asked for.
+- last(role) is O(1): we keep the index of the newest message per role.
+"""
+
+from __future__ import annotations
+
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Literal, Optional, Union
+
+from week01.token_utils import count_tokens
+
+
+ROLES = ("user", "assistant", "tool")
+
+_ROLE_PREFIX = {role: f"{role.upper()}: " for role in ROLES}
+_ROLE_CODE = {role: code for code, role in enumerate(ROLES)}
+
+
+@dataclass(slots=True, frozen=True)
+class ChatMessage:
+    role: Literal["user", "assistant", "tool"]
+    content: str
+
+    def __post_init__(self):
+        if self.role not in _ROLE_PREFIX:
+            raise ValueError(f"Unknown role {self.role!r}; expected one of {ROLES}")
+        object.__setattr__(self, "role", sys.intern(self.role))
+
+
+class Conversation:
+    """
+    Append-only list of ChatMessage with cached rendering.
+
+    Behaves like a read-only list for the existing code (len, iteration,
+    indexing, `conversation + [msg]`), plus:
+    - render():        the whole conversation as "ROLE: content" lines
+    - rendered(i):     one message's rendered line
+    - tokens(i) / token_count
+    - last(role):      newest message with that role, or None
+    """
+
+    __slots__ = (
+        "_text",
+        "_pending",
+        "_starts",
+        "_end",
+        "_roles",
+        "_tokens",
+        "_token_count",
+        "_last_index",
+    )
+
+    def __init__(self, messages: Iterable[ChatMessage] = ()):
+        self._text = ""  # rendered lines folded in so far, "\n"-joined
+        self._pending: List[str] = []  # rendered lines not yet folded into _text
+        self._starts = array("Q")  # where message i starts in the rendered buffer
+        self._end = 0  # rendered buffer length once _pending is folded in
+        self._roles = array("B")  # index into ROLES per message
+        self._tokens = array("I")  # token counts of the first len(_tokens) messages
+        self._token_count = 0
+        self._last_index: Dict[str, int] = {}
+        self.extend(messages)
+
+    # --- appending ------------------------------------------------------------
+
+    def append(self, message: ChatMessage) -> None:
+        if not isinstance(message, ChatMessage):
+            raise TypeError(f"Conversation only holds ChatMessage, got {type(message).__name__}")
+
+        line = _ROLE_PREFIX[message.role] + message.content
+        # Every line but the first is preceded by a "\n" separator.
+        start = self._end + 1 if self._starts else 0
+        self._last_index[message.role] = len(self._starts)
+        self._starts.append(start)
+        self._end = start + len(line)
+        self._roles.append(_ROLE_CODE[message.role])
+        self._pending.append(line)
+
+    def extend(self, messages: Iterable[ChatMessage]) -> None:
+        for message in messages:
+            self.append(message)
+
+    # --- rendering ------------------------------------------------------------------
+
+    def render(self) -> str:
+        """
+        All messages as "ROLE: content" lines joined by newlines.
+        Only messages appended since the last call are formatted/joined.
+        """
+        if self._pending:
+            new_text = "\n".join(self._pending)
+            self._text = f"{self._text}\n{new_text}" if self._text else new_text
+            self._pending.clear()
+        return self._text
+
+    def _span(self, index: int):
+        index = range(len(self._starts))[index]  # normalises negatives, raises IndexError
+        end = self._starts[index + 1] - 1 if index + 1 < len(self._starts) else self._end
+        return index, self._starts[index], end
+
+    def rendered(self, index: int) -> str:
+        """The cached rendered line for one message."""
+        _, start, end = self._span(index)
+        return self.render()[start:end]
+
+    def _message(self, index: int) -> ChatMessage:
+        index, start, end = self._span(index)
+        role = ROLES[self._roles[index]]
+        return ChatMessage(role=role, content=self.render()[start + len(_ROLE_PREFIX[role]) : end])
+
+    def _count_tokens(self) -> None:
+        """Count tokens for messages appended since the last count."""
+        for index in range(len(self._tokens), len(self._starts)):
+            tokens = count_tokens(self.rendered(index))
+            self._tokens.append(tokens)
+            self._token_count += tokens
+
+    def tokens(self, index: int) -> int:
+        self._count_tokens()
+        return self._tokens[index]
+
+    @property
+    def token_count(self) -> int:
+        self._count_tokens()
+        return self._token_count
+
+    # --- lookups ------------------------------------------------------------------------
+
+    def last(self, role: str) -> Optional[ChatMessage]:
+        index = self._last_index.get(role)
+        return None if index is None else self._message(index)
+
+    # --- list-like behaviour --------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __iter__(self) -> Iterator[ChatMessage]:
+        for index in range(len(self._starts)):
+            yield self._message(index)
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self._message(i) for i in range(len(self._starts))[index]]
+        return self._message(index)
+
+    def copy(self) -> "Conversation":
+        """Copy that shares the already-rendered buffer (strings are immutable)."""
+        clone = Conversation.__new__(Conversation)
+        clone._text = self._text
+        clone._pending = list(self._pending)
+        clone._starts = array("Q", self._starts)
+        clone._end = self._end
+        clone._roles = array("B", self._roles)
+        clone._tokens = array("I", self._tokens)
+        clone._token_count = self._token_count
+        clone._last_index = dict(self._last_index)
+        return clone
+
+    def __add__(self, other: Iterable[ChatMessage]) -> "Conversation":
+        result = self.copy()
+        result.extend(other)
+        return result
+
+    def __repr__(self) -> str:
+        return f"Conversation({len(self._starts)} messages)"
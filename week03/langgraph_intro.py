@@ -2,7 +2,7 @@
 week03/langgraph_intro.py
 
 First LangGraph example:
-- State with a list of messages.
+- State with a list of messages (a Conversation, see conversation.py).
 - One LLM node using Ollama (your existing call_ollama_llm).
 - One kb_lookup tool node.
 - A simple router that decides whether to call the tool or answer directly.
@@ -11,20 +11,21 @@ First LangGraph example:
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import List, Literal
+from typing import Callable, Literal, Optional
 
 from langgraph.graph import StateGraph, END
 
-from week01.simple_llm import call_ollama_llm
+from week01.simple_llm import OllamaError, call_ollama_llm
+from week01.semantic_cache import get_semantic_cache
+from week02.tool_cache import ToolCache
+from week03.conversation import ChatMessage, Conversation
 
 
 # --- 1. Define the State -----------------------------------------------------
 
 
-@dataclass
-class ChatMessage:
-    role: Literal["user", "assistant", "tool"]
-    content: str
+# ChatMessage (slotted, interned roles) and Conversation (append-only history
+# with cached prompt rendering) live in week03/conversation.py.
 
 
 @dataclass
@@ -33,17 +34,22 @@ class AgentState:
     The state that flows through the graph.
 
     For now:
-    - messages: chat history (user / assistant / tool)
+    - messages: chat history (user / assistant / tool); a plain list is
+      converted to a Conversation
     - need_tool: whether we should call kb_lookup
     - summarize: whether the user is asking for a summary
     """
-    messages: List[ChatMessage] = field(default_factory=list)
+    messages: Conversation = field(default_factory=Conversation)
     need_tool: bool = False
     summarize: bool = False
     need_note: bool = False
     note_approved: bool = False
     pending_note: str = ""
 
+    def __post_init__(self):
+        if not isinstance(self.messages, Conversation):
+            self.messages = Conversation(self.messages)
+
 # --- 2. A tiny kb_lookup tool (like Week 2, but simpler) ---------------------
 
 
@@ -59,6 +65,11 @@ KNOWLEDGE_BASE = {
 }
 
 
+# Memoized tool results, shared across turns (see week02/tool_cache.py)
+GRAPH_TOOL_CACHE = ToolCache(max_entries=256)
+
+
+@GRAPH_TOOL_CACHE.cached("kb_lookup", ttl=3600, invalidate_on=("kb_reload",))
 def kb_lookup(query: str) -> str:
     q = query.lower()
     for key, value in KNOWLEDGE_BASE.items():
@@ -68,6 +79,18 @@ def kb_lookup(query: str) -> str:
         "I don't have an exact answer in my small knowledge base yet. "
         "Try asking about 'AI agent' or 'LangGraph'."
     )
+
+
+def reload_knowledge_base(entries: dict) -> None:
+    """
+    Replace the knowledge base contents and drop cached kb_lookup results,
+    plus llm_node's cached answers, which may quote the old entries.
+    """
+    KNOWLEDGE_BASE.clear()
+    KNOWLEDGE_BASE.update({key.lower(): value for key, value in entries.items()})
+    GRAPH_TOOL_CACHE.notify("kb_reload")
+    get_semantic_cache().invalidate(namespace=LLM_CACHE_NAMESPACE)
+
 import os
 
 # Define where LangGraph notes will go
@@ -140,7 +163,7 @@ def router_node(state: AgentState) -> AgentState:
 
 def tool_node(state: AgentState) -> AgentState:
     """
-    If need_tool is True, call kb_lookup and append a tool message.
+    If need_tool is True, call kb_lookup (memoized across turns) and append a tool message.
     """
     if not state.messages:
         return state
@@ -156,24 +179,40 @@ def tool_node(state: AgentState) -> AgentState:
     return state
 
 
+LLM_MODEL = "llama3"
+# Cached answers are only valid for the model that produced them
+LLM_CACHE_NAMESPACE = f"llm_node:{LLM_MODEL}"
+
+
 def llm_node(state: AgentState) -> AgentState:
     """
     Call your local Ollama LLM using call_ollama_llm and append an assistant message.
     The prompt will include the conversation so far and any tool output.
+
+    Fresh questions (no earlier assistant turn to depend on) go through the
+    semantic cache first, so paraphrased repeats skip the LLM call
+    (SEMANTIC_CACHE=0 turns it off).
     """
-    conversation_lines = []
-    for msg in state.messages:
-        conversation_lines.append(f"{msg.role.upper()}: {msg.content}")
+    last_user = state.messages.last("user")
+    cacheable = last_user is not None and state.messages.last("assistant") is None
+    cache = get_semantic_cache()
+    if cacheable:
+        cached_answer = cache.lookup(last_user.content, namespace=LLM_CACHE_NAMESPACE)
+        if cached_answer is not None:
+            state.messages.append(ChatMessage(role="assistant", content=cached_answer))
+            return state
 
     prompt = (
         "You are a helpful assistant. You may see TOOL outputs in the conversation.\n"
         "Use them when helpful, and respond clearly to the user.\n\n"
         "Conversation so far:\n"
-        + "\n".join(conversation_lines)
+        + state.messages.render()
         + "\n\nASSISTANT:"
     )
 
-    answer = call_ollama_llm(prompt)
+    answer = call_ollama_llm(prompt, model=LLM_MODEL)
+    if cacheable:
+        cache.put(last_user.content, answer, namespace=LLM_CACHE_NAMESPACE)
     state.messages.append(ChatMessage(role="assistant", content=answer))
     return state
 
@@ -187,9 +226,8 @@ def summarize_node(state: AgentState) -> AgentState:
     if not state.messages:
         return state
 
-    # Turn messages into a text conversation
-    convo_lines = [f"{m.role.upper()}: {m.content}" for m in state.messages]
-    convo_text = "\n".join(convo_lines)
+    # Turn messages into a text conversation (already rendered by Conversation)
+    convo_text = state.messages.render()
 
     prompt = (
         "You are a helpful assistant. Here is a conversation between a user and an assistant "
@@ -212,6 +250,19 @@ def summarize_node(state: AgentState) -> AgentState:
 
 # ---5. Create review_node ------------------
 
+# Optional non-interactive approval hook for review_node.
+# When set, it receives the note draft and returns True to approve it.
+# Batch runs install one so the graph never blocks on input().
+NOTE_APPROVAL_POLICY: Optional[Callable[[str], bool]] = None
+
+
+def set_note_approval_policy(policy: Optional[Callable[[str], bool]]) -> None:
+    """
+    Install (or clear, with None) the approval policy used by review_node.
+    """
+    global NOTE_APPROVAL_POLICY
+    NOTE_APPROVAL_POLICY = policy
+
 def review_node(state: AgentState) -> AgentState:
     """
     security layer: Asks the use to approve the note content.
@@ -220,10 +271,10 @@ def review_node(state: AgentState) -> AgentState:
     if not state.need_note:
         return state
     
-    assistant_msgs = [m for m in state.messages if m.role == "assistant"]
-    if not assistant_msgs:
+    last_assistant = state.messages.last("assistant")
+    if last_assistant is None:
         return state
-    content = assistant_msgs[-1].content
+    content = last_assistant.content
     note_draft = generate_note_draft(content)
     state.pending_note = note_draft
 
@@ -231,9 +282,13 @@ def review_node(state: AgentState) -> AgentState:
     print(state.pending_note)
     print("------------------------------------")
 
-    user_choice = input("Do you approve saving this note? (yes/no): ").strip().lower()
+    if NOTE_APPROVAL_POLICY is not None:
+        approved = bool(NOTE_APPROVAL_POLICY(note_draft))
+    else:
+        user_choice = input("Do you approve saving this note? (yes/no): ").strip().lower()
+        approved = user_choice == "yes"
 
-    if user_choice == "yes":
+    if approved:
         state.note_approved = True
         print(">>> Access Granted. Proceeding to save....")
     else:
@@ -334,7 +389,7 @@ def interactive_loop():
     print("Ask a question (type 'exit' to quit).\n")
 
     # This will persist across turns
-    full_history: List[ChatMessage] = []
+    full_history = Conversation()
 
     while True:
         user_input = input("You: ").strip()
@@ -351,24 +406,27 @@ def interactive_loop():
         state = AgentState(messages=current_messages)
 
         # Run the graph once – LangGraph returns a dict-like state
-        final_state = app.invoke(state)
+        try:
+            final_state = app.invoke(state)
+        except OllamaError as e:
+            print(f"\nAssistant unavailable: {e}\n")
+            continue
 
         # final_state is a dict, so access ["messages"]
-        messages = final_state.get("messages", [])
+        messages = final_state.get("messages", Conversation())
 
-        # Extract assistant messages from this run
-        assistant_msgs = [m for m in messages if m.role == "assistant"]
+        # Last assistant message from this run (could be the summary)
+        last_assistant = messages.last("assistant")
 
-        if assistant_msgs:
-            # Show only the last assistant message (could be the summary)
-            reply = assistant_msgs[-1].content
+        if last_assistant is not None:
+            reply = last_assistant.content
             print(f"\nAssistant: {reply}\n")
 
             # Update full_history:
             #  - we already had history + user
             #  - now we append this final assistant reply
             full_history.append(ChatMessage(role="user", content=user_input))
-            full_history.append(assistant_msgs[-1])
+            full_history.append(last_assistant)
         else:
             print("\nAssistant: (No assistant reply generated.)\n")
             # Still store the user turn so it's visible next time
@@ -0,0 +1,371 @@
+"""
+week04/batch_runner.py
+
+Offline batch runner for agent queries.
+
+- Reads queries from a JSONL file: one {"id": ..., "query": ...} per line
+  ("id" is optional; the line number is used when it is missing).
+- Runs them through the Week 2 ReAct agent or the Week 3 LangGraph app
+  on a thread or process pool.
+- Bounds how many Ollama calls (LLM and embeddings) are in flight at once,
+  independent of the pool size.
+- Streams one JSON result (answer, error, timing) per query to an output JSONL.
+- --no-semantic-cache keeps answers cached by earlier runs out of the
+  results (use it for evaluation).
+- The output file doubles as the checkpoint: on restart, ids that already
+  have a successful result are skipped, so an interrupted run resumes where
+  it stopped. Failed queries (e.g. while Ollama was down) are run again;
+  the newest record for an id is the one that counts.
+
+Usage (from the repo root):
+
+    python -m week04.batch_runner queries.jsonl results.jsonl \\
+        --agent react --executor process --workers 8 --max-llm-concurrency 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+
+AGENTS = ("react", "graph")
+
+
+# --- 1. Reading queries / checkpoint ----------------------------------------
+
+
+def load_queries(path: str) -> List[Dict]:
+    """
+    Read queries from a JSONL file.
+    Blank lines are skipped; a missing "id" falls back to the line number.
+    """
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if "query" not in item:
+                raise ValueError(f"{path}:{line_no}: missing 'query' field")
+            item_id = item.get("id", line_no)
+            queries.append({"id": str(item_id), "query": item["query"]})
+    return queries
+
+
+def load_completed_ids(path: str, retry_errors: bool = True) -> Set[str]:
+    """
+    Collect the ids already answered in the output file.
+    The last record per id wins; with retry_errors, ids whose last record
+    has an "error" are not counted, so they run again.
+    A half-written last line (from an interrupted run) is ignored.
+    """
+    failed: Dict[str, bool] = {}
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                failed[str(record["id"])] = record.get("error") is not None
+            except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+                continue
+    return {item_id for item_id, error in failed.items() if not (retry_errors and error)}
+
+
+def pending_queries(queries: List[Dict], completed: Set[str]) -> Iterator[Dict]:
+    for item in queries:
+        if item["id"] not in completed:
+            yield item
+
+
+# --- 2. Worker side ------------------------------------------------------------
+
+# These globals are set per worker (per process for the process pool,
+# once in the main process for the thread pool).
+_GRAPH_APP = None
+_GRAPH_APP_LOCK = threading.Lock()
+
+
+def _install_worker_hooks(
+    agent: str, llm_slots, approve_notes: bool, semantic_cache: bool = True
+) -> Callable[[], None]:
+    """
+    Prepare this worker:
+    - cap concurrent Ollama requests (LLM and embedding calls) with llm_slots
+    - make review_node non-interactive
+    - optionally turn the semantic answer cache off, so answers are never
+      served from earlier runs (what you want when evaluating)
+
+    Returns a function that puts the previous hooks back. Thread runs call it
+    when the batch ends; pool processes simply exit.
+    """
+    from week01.simple_llm import set_request_slots
+
+    previous_slots = set_request_slots(llm_slots)
+    restore_cache = None
+    if not semantic_cache:
+        from week01.semantic_cache import SemanticCache, set_semantic_cache
+
+        previous_cache = set_semantic_cache(SemanticCache(enabled=False))
+        restore_cache = lambda: set_semantic_cache(previous_cache)
+    restore_policy = None
+    if agent == "graph":
+        import week03.langgraph_intro as langgraph_intro
+
+        previous_policy = langgraph_intro.NOTE_APPROVAL_POLICY
+        langgraph_intro.set_note_approval_policy(lambda draft: approve_notes)
+        restore_policy = lambda: langgraph_intro.set_note_approval_policy(previous_policy)
+
+    def restore() -> None:
+        set_request_slots(previous_slots)
+        if restore_cache is not None:
+            restore_cache()
+        if restore_policy is not None:
+            restore_policy()
+
+    return restore
+
+
+def _get_graph_app():
+    global _GRAPH_APP
+    with _GRAPH_APP_LOCK:
+        if _GRAPH_APP is None:
+            from week03.langgraph_intro import build_graph
+
+            _GRAPH_APP = build_graph()
+    return _GRAPH_APP
+
+
+def _answer_with_graph(query: str) -> str:
+    from week03.langgraph_intro import AgentState, ChatMessage
+
+    app = _get_graph_app()
+    final_state = app.invoke(AgentState(messages=[ChatMessage(role="user", content=query)]))
+    last_assistant = final_state["messages"].last("assistant")
+    return "" if last_assistant is None else last_assistant.content
+
+
+def run_one(agent: str, item: Dict, max_steps: int, structured: bool = False) -> Dict:
+    """
+    Run a single query and return its result record.
+    Exceptions are recorded in "error" so one bad query never stops the batch.
+    """
+    started = time.perf_counter()
+    answer = None
+    error = None
+    try:
+        if agent == "react":
+            from week02.react_agent import run_react_agent
+
+            answer = run_react_agent(item["query"], max_steps=max_steps, structured=structured)
+        else:
+            answer = _answer_with_graph(item["query"])
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    return {
+        "id": item["id"],
+        "query": item["query"],
+        "agent": agent,
+        "answer": answer,
+        "error": error,
+        "elapsed_s": round(time.perf_counter() - started, 4),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+# --- 3. Driver -------------------------------------------------------------------
+
+
+def _make_executor(
+    kind: str,
+    workers: int,
+    agent: str,
+    max_llm_concurrency: int,
+    approve_notes: bool,
+    semantic_cache: bool = True,
+) -> Tuple[Executor, Callable[[], None]]:
+    """
+    Build the pool. Also returns a function that undoes any hooks
+    installed in this (the parent) process.
+    """
+    if kind == "thread":
+        llm_slots = (
+            threading.BoundedSemaphore(max_llm_concurrency) if max_llm_concurrency > 0 else None
+        )
+        # Threads share the main process, so install the hooks once here.
+        restore = _install_worker_hooks(agent, llm_slots, approve_notes, semantic_cache)
+        return ThreadPoolExecutor(max_workers=workers), restore
+
+    llm_slots = (
+        multiprocessing.BoundedSemaphore(max_llm_concurrency) if max_llm_concurrency > 0 else None
+    )
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_install_worker_hooks,
+        initargs=(agent, llm_slots, approve_notes, semantic_cache),
+    )
+    return pool, lambda: None
+
+
+def _open_output(path: str):
+    """
+    Open the output file for appending.
+    If a previous run died mid-line, start on a fresh line.
+    """
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    needs_newline = False
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    out = open(path, "a", encoding="utf-8")
+    if needs_newline:
+        out.write("\n")
+    return out
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    agent: str = "react",
+    executor: str = "thread",
+    workers: int = 4,
+    max_llm_concurrency: int = 2,
+    max_steps: int = 5,
+    approve_notes: bool = False,
+    structured: bool = False,
+    retry_errors: bool = True,
+    semantic_cache: bool = True,
+) -> Dict:
+    """
+    Run every pending query from input_path and append results to output_path.
+    Returns a small summary dict (counts and wall time).
+    """
+    if agent not in AGENTS:
+        raise ValueError(f"Unknown agent {agent!r}; expected one of {AGENTS}")
+    if executor not in ("thread", "process"):
+        raise ValueError(f"Unknown executor {executor!r}; expected 'thread' or 'process'")
+
+    queries = load_queries(input_path)
+    completed = load_completed_ids(output_path, retry_errors=retry_errors)
+    todo = list(pending_queries(queries, completed))
+    skipped = len(queries) - len(todo)
+
+    print(
+        f"=== Batch run: {len(queries)} queries, {skipped} already done, "
+        f"{len(todo)} to run ({agent}, {executor} x{workers}, "
+        f"LLM concurrency {max_llm_concurrency or 'unbounded'}) ==="
+    )
+
+    summary = {"total": len(queries), "skipped": skipped, "ok": 0, "errors": 0}
+    if not todo:
+        summary["wall_s"] = 0.0
+        return summary
+
+    started = time.perf_counter()
+    pool, restore_hooks = _make_executor(
+        executor, workers, agent, max_llm_concurrency, approve_notes, semantic_cache
+    )
+    out = _open_output(output_path)
+    try:
+        futures = [pool.submit(run_one, agent, item, max_steps, structured) for item in todo]
+        for done_count, future in enumerate(as_completed(futures), start=1):
+            record = future.result()
+            # One line per result, flushed right away: this is the checkpoint.
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+
+            if record["error"]:
+                summary["errors"] += 1
+            else:
+                summary["ok"] += 1
+            print(
+                f"[{done_count}/{len(todo)}] id={record['id']} "
+                f"{record['elapsed_s']:.2f}s {'ERROR' if record['error'] else 'ok'}"
+            )
+    except KeyboardInterrupt:
+        print("\nInterrupted. Finished results are saved; re-run to resume.")
+        raise
+    finally:
+        out.close()
+        pool.shutdown(wait=True, cancel_futures=True)
+        restore_hooks()
+
+    summary["wall_s"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run agent queries from a JSONL file.")
+    parser.add_argument("input", help="JSONL file with one {'id', 'query'} object per line")
+    parser.add_argument("output", help="JSONL file to append results to (also the checkpoint)")
+    parser.add_argument("--agent", choices=AGENTS, default="react")
+    parser.add_argument("--executor", choices=("thread", "process"), default="thread")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--max-llm-concurrency",
+        type=int,
+        default=2,
+        help="max Ollama requests (LLM + embeddings) in flight across all workers (0 = unbounded)",
+    )
+    parser.add_argument("--max-steps", type=int, default=5, help="ReAct step limit per query")
+    parser.add_argument(
+        "--structured",
+        action="store_true",
+        help="ReAct agent uses JSON-schema actions instead of the text protocol",
+    )
+    parser.add_argument(
+        "--no-retry-errors",
+        dest="retry_errors",
+        action="store_false",
+        help="on resume, also skip queries whose previous result was an error",
+    )
+    parser.add_argument(
+        "--no-semantic-cache",
+        dest="semantic_cache",
+        action="store_false",
+        help="never answer from the semantic cache (e.g. for evaluation runs)",
+    )
+    parser.add_argument(
+        "--approve-notes",
+        action="store_true",
+        help="auto-approve note saves in the LangGraph app (default: deny)",
+    )
+    args = parser.parse_args(argv)
+
+    summary = run_batch(
+        args.input,
+        args.output,
+        agent=args.agent,
+        executor=args.executor,
+        workers=args.workers,
+        max_llm_concurrency=args.max_llm_concurrency,
+        max_steps=args.max_steps,
+        approve_notes=args.approve_notes,
+        structured=args.structured,
+        retry_errors=args.retry_errors,
+        semantic_cache=args.semantic_cache,
+    )
+    print(f"\nDone: {summary}")
+
+
+if __name__ == "__main__":
+    main()